@@ -1,4 +1,5 @@
 import express from "express"
+import type { PDFOptions } from "puppeteer-core"
 import { launchBrowser } from "../utils/browser"
 import { Request, Response } from "express"
 import { uploadBufferToS3 } from "../utils/s3"
@@ -16,6 +17,29 @@ import { circuitBreaker } from "../utils/circuitBreaker"
 
 const router = express.Router()
 
+// page.pdf() options a request may set; anything else (path, timeout, ...) is dropped
+const PDF_OPTION_KEYS = [
+  "format",
+  "landscape",
+  "margin",
+  "scale",
+  "printBackground",
+  "pageRanges",
+  "width",
+  "height",
+  "preferCSSPageSize",
+] as const
+
+function pdfOptions(options: unknown): PDFOptions {
+  const picked: Record<string, unknown> = {}
+  if (options && typeof options === "object") {
+    for (const key of PDF_OPTION_KEYS) {
+      if (key in options) picked[key] = (options as Record<string, unknown>)[key]
+    }
+  }
+  return picked as PDFOptions
+}
+
 router.post("/pdf", async (req: Request, res: Response) => {
   const { task_id, url, options } = req.body
   pdfTasksCounter.inc()
@@ -26,23 +50,47 @@ router.post("/pdf", async (req: Request, res: Response) => {
   }
 
   const end = pdfProcessingDuration.startTimer()
+  // success | error | abandoned (the client hung up, e.g. the losing copy of a hedged request)
+  let status = "error"
+
+  // Workers hedge slow renders and drop the losing connection; stop rendering for a client that is gone
+  let browser: Awaited<ReturnType<typeof launchBrowser>> | undefined
+  let abandoned = false
+  res.on("close", () => {
+    if (res.writableFinished) return
+    abandoned = true
+    browser?.close().catch(() => {})
+  })
+  const recordAbandoned = () => {
+    status = "abandoned"
+    pdfProcessedCounter.labels(status).inc()
+    log.info({ message: "Client went away, render abandoned" })
+  }
 
   return await circuitBreaker.execute(async () => {
     try {
-      const browser = await launchBrowser()
+      browser = await launchBrowser()
+      if (abandoned) {
+        await browser.close()
+        return recordAbandoned()
+      }
       const page = await browser.newPage()
       await page.goto(url, { waitUntil: "networkidle0" })
 
       const pdfBuffer = await page.pdf({
         format: "A4",
         printBackground: true,
-        ...options,
+        ...pdfOptions(options),
       })
       await browser.close()
 
+      // The winning request writes the same key; never overwrite it from an abandoned one
+      if (abandoned) return recordAbandoned()
+
       const s3Url = await uploadBufferToS3(task_id, pdfBuffer, "pdf")
 
-      pdfProcessedCounter.labels("success").inc()
+      status = "success"
+      pdfProcessedCounter.labels(status).inc()
 
       log.info({
         message: "PDF processed and uploaded successfully",
@@ -53,6 +101,7 @@ router.post("/pdf", async (req: Request, res: Response) => {
         url: s3Url,
       })
     } catch (err: any) {
+      if (abandoned) return recordAbandoned()
       log.error(
         {
           err,
@@ -62,7 +111,7 @@ router.post("/pdf", async (req: Request, res: Response) => {
       pdfErrorCounter.inc()
       return res.status(500).json({ error: "Failed to render and upload PDF" })
     } finally {
-      end()
+      end({ status })
     }
   })
 })
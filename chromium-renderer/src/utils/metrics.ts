@@ -27,6 +27,7 @@ export const pdfErrorCounter = new client.Counter({
 export const pdfProcessingDuration = new client.Histogram({
   name: "pdf_processing_duration_seconds",
   help: "Duration of processing PDFs",
+  labelNames: ["status"],
   buckets: [0.1, 0.5, 1, 2, 5],
 })
 
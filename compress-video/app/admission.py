@@ -0,0 +1,148 @@
+import os
+import threading
+from typing import Optional
+from contextlib import contextmanager
+
+import msgspec
+
+from taskforge_worker.logger import log
+from taskforge_worker.admission import AdmissionController, ADMISSION_MEMORY_FRACTION, _memory_limit
+from app.workspace import WORKSPACE_MEMORY_MAX_INPUT_BYTES, WORKSPACE_SIZE_FACTOR, WORKSPACE_UNKNOWN_SIZE_BYTES, WORKSPACE_DISK_QUOTA_BYTES, WORKSPACE_MEMORY_QUOTA_BYTES
+from app.task_schema import CompressVideoTask
+
+logger = log("compress-video")
+
+ADMISSION_PROBE_TIMEOUT = float(os.getenv("ADMISSION_PROBE_TIMEOUT", 15))
+ADMISSION_FFMPEG_BASE_BYTES = int(os.getenv("ADMISSION_FFMPEG_BASE_BYTES", 64 * 1024 * 1024))
+# Decoded frames ffmpeg keeps alive (decoder refs, filter graph, encoder lookahead)
+ADMISSION_FRAME_BUFFERS = int(os.getenv("ADMISSION_FRAME_BUFFERS", 48))
+# Cores one 1080p source keeps busy; scaled by source pixel count
+ADMISSION_JOB_CPU = float(os.getenv("ADMISSION_JOB_CPU", 1.0))
+# Memory running encodes may reserve; defaults to the admission share of the memory limit less the tmpfs quota
+ADMISSION_ENCODE_MEMORY_BYTES = int(os.getenv("ADMISSION_ENCODE_MEMORY_BYTES", 0))
+
+DEFAULT_WIDTH, DEFAULT_HEIGHT = 1920, 1080
+OUTPUT_HEIGHT = 720
+AUDIO_BITRATE = 128_000
+DEFAULT_VIDEO_BITRATE = 1_000_000
+
+
+class Footprint(msgspec.Struct, frozen=True):
+    """Estimated peak resources of one compression job"""
+    input_bytes: Optional[int]
+    # Held for the whole job: the tmpfs workspace of small inputs
+    memory_bytes: int
+    # Held only while ffmpeg runs, see encoding()
+    encode_memory_bytes: int
+    disk_bytes: int
+    cpu: float
+    width: Optional[int] = None
+    height: Optional[int] = None
+    duration: Optional[float] = None
+
+    def needs(self) -> dict:
+        return {"memory": self.memory_bytes, "disk": self.disk_bytes, "cpu": self.cpu}
+
+
+def _probe_size(url: str):
+    """Content-Length of the source, or None if the server does not say"""
+    import requests
+    try:
+        response = requests.head(url, allow_redirects=True, timeout=10)
+        length = response.headers.get("Content-Length")
+        return int(length) if response.ok and length else None
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def _probe_media(url: str):
+    """(width, height, duration) of the first video stream; None for anything ffprobe could not tell"""
+    import ffmpeg
+    try:
+        info = ffmpeg.probe(url, timeout=ADMISSION_PROBE_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"⚠️ ffprobe of {url} failed, assuming 1080p: {e}")
+        return None, None, None
+
+    video = next((s for s in info.get("streams", []) if s.get("codec_type") == "video"), {})
+    duration = video.get("duration") or info.get("format", {}).get("duration")
+    return video.get("width"), video.get("height"), float(duration) if duration else None
+
+
+def _parse_bitrate(bitrate: Optional[str]) -> int:
+    if not bitrate:
+        return DEFAULT_VIDEO_BITRATE
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(bitrate[-1].lower(), 1)
+    try:
+        return int(float(bitrate.rstrip("kKmM")) * multiplier)
+    except ValueError:
+        return DEFAULT_VIDEO_BITRATE
+
+
+def estimate(task: CompressVideoTask) -> Footprint:
+    """Footprint of one job from the source's Content-Length and ffprobe'd resolution/duration"""
+    payload = task.payload
+    input_bytes = _probe_size(payload.video_url)
+    width, height, duration = _probe_media(payload.video_url)
+    source_pixels = (width or DEFAULT_WIDTH) * (height or DEFAULT_HEIGHT)
+    output_pixels = OUTPUT_HEIGHT * 16 // 9 * OUTPUT_HEIGHT
+
+    if input_bytes is None:
+        disk_bytes = WORKSPACE_UNKNOWN_SIZE_BYTES
+    elif duration:
+        output_bytes = int(duration * (_parse_bitrate(payload.bitrate) + AUDIO_BITRATE) / 8 * 1.1)
+        disk_bytes = input_bytes + output_bytes
+    else:
+        disk_bytes = int(input_bytes * WORKSPACE_SIZE_FACTOR)
+
+    # yuv420p frames: 1.5 bytes per pixel, for both the decoded source and the scaled output
+    encode_memory_bytes = ADMISSION_FFMPEG_BASE_BYTES + int((source_pixels + output_pixels) * 1.5 * ADMISSION_FRAME_BUFFERS)
+    memory_bytes = 0
+    if input_bytes is not None and input_bytes <= WORKSPACE_MEMORY_MAX_INPUT_BYTES:
+        # Small jobs live on tmpfs, which is charged to memory rather than disk
+        memory_bytes, disk_bytes = disk_bytes, 0
+
+    cpu = ADMISSION_JOB_CPU * min(2.0, max(0.5, source_pixels / (DEFAULT_WIDTH * DEFAULT_HEIGHT)))
+    return Footprint(input_bytes, memory_bytes, encode_memory_bytes, disk_bytes, cpu, width, height, duration)
+
+
+# Admitted jobs hold their workspace: tmpfs (bounded by its quota) and the disk quota. ffmpeg's memory is
+# reserved around the encode stage instead, and CPU is bounded by the pipeline's encode pool, so jobs can
+# download and upload while another encodes
+BUDGET_DEFAULTS = {"memory": WORKSPACE_MEMORY_QUOTA_BYTES, "disk": WORKSPACE_DISK_QUOTA_BYTES, "cpu": float("inf")}
+
+
+class _EncodeMemory(msgspec.Struct, frozen=True):
+    memory_bytes: int
+
+    def needs(self) -> dict:
+        return {"encode_memory": self.memory_bytes}
+
+
+_encodes = None
+_encodes_lock = threading.Lock()
+
+def _encode_admission() -> AdmissionController:
+    global _encodes
+    if _encodes is None:
+        with _encodes_lock:
+            if _encodes is None:
+                budget = ADMISSION_ENCODE_MEMORY_BYTES or max(0, int(_memory_limit() * ADMISSION_MEMORY_FRACTION) - WORKSPACE_MEMORY_QUOTA_BYTES)
+                _encodes = AdmissionController({"encode_memory": budget})
+    return _encodes
+
+
+@contextmanager
+def encoding(footprint: Footprint):
+    """
+    Hold the job's encode memory while ffmpeg runs, waiting as long as it
+    takes for running encodes to release enough; an encode larger than the
+    whole budget runs alone.
+    """
+    reservation = _EncodeMemory(footprint.encode_memory_bytes)
+    admission = _encode_admission()
+    admission.admit(reservation, timeout=threading.TIMEOUT_MAX)
+    try:
+        yield
+    finally:
+        admission.release(reservation)
@@ -1,57 +1,196 @@
+import os
+
 import ffmpeg
 
-from app.utils.logger import log
+from taskforge_worker.logger import log
+from taskforge_worker.admission import _cpu_limit
+from taskforge_worker import usage
 from app.utils.metrics import ffmpeg_failures_total
 
 logger = log("compress-video")
 
+# Codec for webm jobs that do not ask for one: "vp9", "av1" (SVT-AV1) or "vp8" (libvpx/Vorbis, the old default)
+# vp9 balanced encodes the reference clip ~3x faster than vp8 (and faster than mp4), see the README
+WEBM_VIDEO_CODEC = os.getenv("WEBM_VIDEO_CODEC", "vp9")
+# Tier for vp9/av1 jobs without a preset, see WEBM_PROFILES
+WEBM_DEFAULT_TIER = os.getenv("WEBM_DEFAULT_TIER", "balanced")
+# Encoder threads per job; libvpx does not scale on its own, so size it from the pod's CPU limit
+FFMPEG_THREADS = int(os.getenv("FFMPEG_THREADS", 0)) or max(1, min(8, round(_cpu_limit())))
+# Target length of an HLS segment; a keyframe is forced at every boundary so segments cut exactly here
+HLS_SEGMENT_SECONDS = int(os.getenv("HLS_SEGMENT_SECONDS", 4))
+
+TIERS = ("speed", "balanced", "quality")
+
+# Speed/quality tiers for vp9/av1 webm jobs; benchmark_profiles.py numbers for them are in the README.
+# - speed:    realtime cpu-used 8 / SVT-AV1 preset 10, the lowest quality per bit; previews, backfills
+# - balanced: the default; realtime cpu-used 6 / preset 8, encodes faster than mp4 "fast" at SSIM 0.987.
+#             "good" mode at cpu-used 4-6 was 3x slower than mp4 on one core.
+# - quality:  "good" cpu-used 4 with alt-ref frames / preset 6, about 3x the encode time of balanced for mp4-level SSIM
+WEBM_PROFILES = {
+    "vp9": {
+        "speed": {"deadline": "realtime", "cpu-used": 8},
+        "balanced": {"deadline": "realtime", "cpu-used": 6},
+        "quality": {"deadline": "good", "cpu-used": 4, "auto-alt-ref": 1, "lag-in-frames": 25},
+    },
+    "av1": {
+        "speed": {"preset": 10},
+        "balanced": {"preset": 8},
+        "quality": {"preset": 6},
+    },
+}
+
+# x264 preset names clients already send, mapped onto the tiers (and back, for mp4 jobs given a tier)
+_PRESET_TIERS = {
+    "ultrafast": "speed", "superfast": "speed", "veryfast": "speed", "faster": "speed",
+    "fast": "balanced", "medium": "balanced",
+    "slow": "quality", "slower": "quality", "veryslow": "quality", "placebo": "quality",
+}
+_TIER_X264_PRESETS = {"speed": "veryfast", "balanced": "fast", "quality": "slow"}
+
+OUTPUT_HEIGHT = 720
+# VP9 tiles must be at least 256px wide; 4 columns (log2 = 2) is the most a 1280px frame allows
+VP9_TILE_COLUMNS = 2
+KEYFRAME_INTERVAL = 240
+
+
+def webm_tier(preset) -> str:
+    if preset in TIERS:
+        return preset
+    if preset in _PRESET_TIERS:
+        return _PRESET_TIERS[preset]
+    if preset:
+        logger.warning(f"⚠️ Unknown preset '{preset}' for webm, using {WEBM_DEFAULT_TIER}")
+    return WEBM_DEFAULT_TIER
+
+
+def encoder_args(output_fmt: str, preset=None, codec=None) -> dict:
+    """ffmpeg output options (codecs, rate-control and speed settings) for a format and preset/tier"""
+    if output_fmt != "webm":
+        return {
+            "vcodec": "libx264",
+            "acodec": "aac",
+            "audio_bitrate": "128k",
+            "preset": _TIER_X264_PRESETS.get(preset, preset or "fast"),
+            "movflags": "+faststart",
+        }
+
+    codec = codec or WEBM_VIDEO_CODEC
+    if codec == "vp8":
+        # The original webm encode; libvpx has no presets, so there are no tiers
+        return {"vcodec": "libvpx", "acodec": "libvorbis", "audio_bitrate": "128k"}
+
+    tier = webm_tier(preset)
+    args = {"acodec": "libopus", "audio_bitrate": "96k", "g": KEYFRAME_INTERVAL, "pix_fmt": "yuv420p"}
+    if codec == "av1":
+        # SVT-AV1 threads itself across the whole frame; no tile or thread tuning needed
+        args.update(vcodec="libsvtav1", **WEBM_PROFILES["av1"][tier])
+    else:
+        args.update({
+            "vcodec": "libvpx-vp9",
+            "row-mt": 1,
+            "tile-columns": VP9_TILE_COLUMNS,
+            "frame-parallel": 0,
+            "threads": FFMPEG_THREADS,
+            **WEBM_PROFILES["vp9"][tier],
+        })
+    return args
+
+
 def compress_video(input_path: str, output_path: str, options: dict = {}):
     """
     Compress a video using ffmpeg.
-    
+
     Supported options:
     - format: 'mp4', 'webm' (default: mp4)
     - bitrate: e.g., '1000k' (default)
-    - preset: 'fast', 'slow', etc. (default: 'fast')
+    - preset: a tier ('speed', 'balanced', 'quality') or an x264 preset name (default: 'fast' / WEBM_DEFAULT_TIER)
+    - codec: 'vp9', 'av1' or 'vp8', webm only (default: WEBM_VIDEO_CODEC)
     """
 
-    format = options.get("format", "mp4")
-    bitrate = options.get("bitrate", "1000k")
-    preset = options.get("preset", "fast")
-
-    # Determine codecs based on format
-    if format == "webm":
-        vcodec = "libvpx"
-        acodec = "libvorbis"
-    else:
-        vcodec = "libx264"
-        acodec = "aac"
+    output_fmt = options.get("format") or "mp4"
+    # Keys are present with None when the task left them out
+    bitrate = options.get("bitrate") or "1000k"
+    args = encoder_args(output_fmt, options.get("preset"), options.get("codec"))
+    vcodec = args["vcodec"]
 
     try:
-        logger.info(f"Compressing with: vcodec={vcodec}, acodec={acodec}, bitrate={bitrate}, preset={preset}")
+        logger.info(f"Compressing with: {args}, bitrate={bitrate}")
 
-        (
+        process = (
             ffmpeg
             .input(input_path)
             .output(
                 output_path,
-                vf='scale=-2:720',
-                vcodec=vcodec,
-                acodec=acodec,
+                vf=f'scale=-2:{OUTPUT_HEIGHT}',
                 video_bitrate=bitrate,
-                audio_bitrate='128k',
-                preset=preset,
-                movflags='+faststart',
-                map_metadata=-1 
+                map_metadata=-1,
+                **args
             )
             .overwrite_output()
-            .run(quiet=False)
+            .run_async()
         )
+        # Reaped here rather than by .run() so its CPU, memory and I/O are charged to the task
+        if usage.wait_child(process):
+            raise ffmpeg.Error("ffmpeg", None, None)
 
         logger.info(f"FFmpeg compression finished → {output_path}")
 
     except ffmpeg.Error as e:
-        ffmpeg_failures_total.labels(codec=vcodec, format=format).inc()
+        ffmpeg_failures_total.labels(codec=vcodec, format=output_fmt).inc()
         logger.error("FFmpeg compression failed")
         logger.error(e.stderr.decode() if e.stderr else str(e))
         raise RuntimeError("Compression failed") from e
+
+
+def compress_video_hls(input_path: str, out_dir: str, options: dict = {}):
+    """
+    Compress a video to H.264 HLS with fragmented-MP4 segments in out_dir:
+    index.m3u8, init.mp4 and seg_NNNNN.m4s. The playlist is an "event"
+    playlist rewritten as each segment is finished, so segments can be
+    shipped while the encode is still running.
+
+    Takes the same options as compress_video; format is always mp4.
+    """
+
+    bitrate = options.get("bitrate") or "1000k"
+    args = encoder_args("mp4", options.get("preset"))
+    # faststart rewrites a finished file; fragments carry their own headers
+    args.pop("movflags")
+    vcodec = args["vcodec"]
+
+    try:
+        logger.info(f"Compressing to HLS with: {args}, bitrate={bitrate}, {HLS_SEGMENT_SECONDS}s segments")
+
+        process = (
+            ffmpeg
+            .input(input_path)
+            .output(
+                os.path.join(out_dir, "index.m3u8"),
+                vf=f'scale=-2:{OUTPUT_HEIGHT}',
+                video_bitrate=bitrate,
+                map_metadata=-1,
+                force_key_frames=f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})",
+                f="hls",
+                hls_time=HLS_SEGMENT_SECONDS,
+                hls_playlist_type="event",
+                hls_segment_type="fmp4",
+                hls_fmp4_init_filename="init.mp4",
+                hls_segment_filename=os.path.join(out_dir, "seg_%05d.m4s"),
+                # temp_file: a segment only appears under its name once it is complete
+                hls_flags="independent_segments+temp_file",
+                **args
+            )
+            .overwrite_output()
+            .run_async()
+        )
+        # Reaped here rather than by .run() so its CPU, memory and I/O are charged to the task
+        if usage.wait_child(process):
+            raise ffmpeg.Error("ffmpeg", None, None)
+
+        logger.info(f"FFmpeg HLS compression finished → {out_dir}")
+
+    except ffmpeg.Error as e:
+        ffmpeg_failures_total.labels(codec=vcodec, format="hls").inc()
+        logger.error("FFmpeg HLS compression failed")
+        logger.error(e.stderr.decode() if e.stderr else str(e))
+        raise RuntimeError("Compression failed") from e
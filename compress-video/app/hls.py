@@ -0,0 +1,165 @@
+import os
+import time
+import threading
+
+from taskforge_worker.logger import log
+from taskforge_worker.s3 import upload_file, upload_bytes, read_bytes, generate_signed_url, record_key
+from taskforge_worker.circuit_breaker import get_breaker
+from taskforge_worker import usage
+from app.utils.metrics import hls_segments_uploaded_total, hls_time_to_playable_seconds
+
+logger = log("compress-video")
+
+# Segment and playlist URLs handed to players; long enough to watch the whole video, unlike S3_SIGNED_URL_EXP
+HLS_URL_EXPIRE_SECONDS = int(os.getenv("HLS_URL_EXPIRE_SECONDS", 6 * 3600))
+# How often the encoder's playlist is checked for newly finished segments
+HLS_POLL_SECONDS = float(os.getenv("HLS_POLL_SECONDS", 0.5))
+# Segments that must be in S3 before the playlist is announced, so playback does not stall right away
+HLS_READY_SEGMENTS = int(os.getenv("HLS_READY_SEGMENTS", 2))
+
+PLAYLIST = "index.m3u8"
+# Copy of the playlist with every URI presigned; the one players are given
+SIGNED_PLAYLIST = "play.m3u8"
+PLAYLIST_CONTENT_TYPE = "application/vnd.apple.mpegurl"
+CONTENT_TYPES = {".m4s": "video/iso.segment", ".mp4": "video/mp4"}
+
+
+def key_prefix(task_id: str) -> str:
+    return f"compressed-videos/{task_id}"
+
+
+def playlist_key(task_id: str) -> str:
+    """The finished playlist; only written once the encode is complete, so it marks a usable output"""
+    return f"{key_prefix(task_id)}/{PLAYLIST}"
+
+
+def _uri(line: str):
+    """The media file a playlist line refers to: a segment line, or the init section of #EXT-X-MAP"""
+    if line.startswith("#EXT-X-MAP:"):
+        _, _, rest = line.partition('URI="')
+        return rest.split('"', 1)[0] or None
+    if line and not line.startswith("#"):
+        return line
+    return None
+
+
+def media_files(text: str) -> list:
+    return [uri for uri in map(_uri, text.splitlines()) if uri]
+
+
+def sign_playlist(text: str, prefix: str) -> str:
+    """The private bucket serves nothing unsigned, so every URI in the playlist becomes a presigned URL"""
+    lines = []
+    for line in text.splitlines():
+        uri = _uri(line)
+        if uri:
+            url = generate_signed_url(f"{prefix}/{os.path.basename(uri)}", HLS_URL_EXPIRE_SECONDS)
+            line = line.replace(uri, url)
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def publish_signed(text: str, prefix: str) -> str:
+    """Upload a signed copy of the playlist and return its URL"""
+    key = f"{prefix}/{SIGNED_PLAYLIST}"
+    upload_bytes(sign_playlist(text, prefix).encode(), key, PLAYLIST_CONTENT_TYPE)
+    return generate_signed_url(key, HLS_URL_EXPIRE_SECONDS)
+
+
+def resign(task_id: str) -> str:
+    """A fresh playable URL for a finished HLS output whose earlier signatures may have expired"""
+    prefix = key_prefix(task_id)
+    text = get_breaker("s3").execute(lambda: read_bytes(playlist_key(task_id))).decode()
+    return get_breaker("s3").execute(lambda: publish_signed(text, prefix))
+
+
+class SegmentUploader:
+    """
+    Ships an HLS encode to S3 while ffmpeg is still writing it.
+
+    A thread polls the encoder's playlist every HLS_POLL_SECONDS; each
+    media file it newly lists is complete (ffmpeg renames segments into
+    place), so it is uploaded, deleted locally, and a signed copy of the
+    playlist follows it. Once HLS_READY_SEGMENTS segments are up,
+    on_playable(url) is called with the live playlist URL. finish() ships
+    what is left, writes the final playlist and returns the playable URL.
+    """
+
+    def __init__(self, task_id: str, out_dir: str, on_playable):
+        self.task_id = task_id
+        self.out_dir = out_dir
+        self.prefix = key_prefix(task_id)
+        self.on_playable = on_playable
+        self.uploaded = set()
+        self.segments = 0
+        self.url = None
+        self.error = None
+        self._started = time.monotonic()
+        self._usage = usage.current()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"hls-{task_id}", daemon=True)
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def finish(self) -> str:
+        self.stop()
+        if self.error is not None:
+            raise self.error
+        self._sync(final=True)
+        return self.url
+
+    def _loop(self):
+        while not self._stop.wait(HLS_POLL_SECONDS):
+            try:
+                with usage.activate(self._usage):
+                    self._sync()
+            except Exception as e:
+                # Surfaces from finish(); the encode carries on and the next attempt starts over
+                logger.error(f"HLS upload failed for task {self.task_id}: {e}")
+                self.error = e
+                return
+
+    def _sync(self, final: bool = False):
+        path = os.path.join(self.out_dir, PLAYLIST)
+        if not os.path.exists(path):
+            if final:
+                raise RuntimeError("Encoder finished without writing a playlist")
+            return
+        with open(path) as f:
+            text = f.read()
+
+        new = [uri for uri in media_files(text) if uri not in self.uploaded]
+        for uri in new:
+            self._upload(uri)
+        if not new and not final:
+            return
+
+        self.url = get_breaker("s3").execute(lambda: publish_signed(text, self.prefix))
+        if final:
+            # Unsigned, so resign() can hand out fresh URLs later
+            get_breaker("s3").execute(lambda: upload_bytes(text.encode(), playlist_key(self.task_id), PLAYLIST_CONTENT_TYPE))
+            record_key(playlist_key(self.task_id))
+
+        if self.on_playable is not None and (final or self.segments >= HLS_READY_SEGMENTS):
+            hls_time_to_playable_seconds.observe(time.monotonic() - self._started)
+            logger.info(f"▶️ Task {self.task_id} playable after {self.segments} segments")
+            self.on_playable(self.url)
+            self.on_playable = None
+
+    def _upload(self, uri: str):
+        local = uri if os.path.isabs(uri) else os.path.join(self.out_dir, uri)
+        name = os.path.basename(uri)
+        content_type = CONTENT_TYPES.get(os.path.splitext(name)[1], "application/octet-stream")
+        get_breaker("s3").execute(lambda: upload_file(local, f"{self.prefix}/{name}", content_type))
+        # Only the segments not yet shipped are ever on disk
+        os.remove(local)
+        self.uploaded.add(uri)
+        if name.endswith(".m4s"):
+            self.segments += 1
+            hls_segments_uploaded_total.inc()
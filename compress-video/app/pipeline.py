@@ -0,0 +1,94 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+from taskforge_worker.logger import log
+from taskforge_worker import usage, profiler
+from app.utils.metrics import pipeline_queue_depth, pipeline_stage_workers, pipeline_stage_busy_seconds_total, pipeline_stage_wait_seconds
+
+logger = log("compress-video")
+
+# Workers per stage; the encode pool is what actually bounds CPU use
+PIPELINE_DOWNLOAD_WORKERS = int(os.getenv("PIPELINE_DOWNLOAD_WORKERS", 1))
+PIPELINE_ENCODE_WORKERS = int(os.getenv("PIPELINE_ENCODE_WORKERS", 1))
+PIPELINE_UPLOAD_WORKERS = int(os.getenv("PIPELINE_UPLOAD_WORKERS", 1))
+# Jobs that may wait in front of each stage; a full queue blocks the stage before it
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 1))
+
+
+class Stage:
+    """
+    A fixed pool of threads working one step of a job. Finished jobs are put
+    on the next stage's bounded queue, blocking while it is full, so a slow
+    stage holds back the ones before it instead of letting work (and
+    downloaded bytes) pile up.
+    """
+
+    def __init__(self, name: str, fn, workers: int, capacity: int):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.next = None
+        self.queue = queue.Queue(maxsize=capacity)
+        pipeline_stage_workers.labels(stage=name).set(workers)
+        pipeline_queue_depth.labels(stage=name).set_function(self.queue.qsize)
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True).start()
+
+    def put(self, item):
+        item.queued_at = time.monotonic()
+        self.queue.put(item)
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            pipeline_stage_wait_seconds.labels(stage=self.name).observe(time.monotonic() - item.queued_at)
+            started = time.monotonic()
+            try:
+                with logger.contextualize(taskId=item.task_id, traceId=item.trace_id), usage.activate(item.usage), profiler.activate(item.profile):
+                    result = self.fn(item.job)
+            except BaseException as e:
+                item.future.set_exception(e)
+                continue
+            finally:
+                pipeline_stage_busy_seconds_total.labels(stage=self.name).inc(time.monotonic() - started)
+
+            if self.next is None:
+                item.future.set_result(result)
+            else:
+                self.next.put(item)
+
+
+class _Item:
+    __slots__ = ("job", "task_id", "trace_id", "usage", "profile", "future", "queued_at")
+
+    def __init__(self, job, task_id, trace_id):
+        self.job = job
+        self.task_id = task_id
+        self.trace_id = trace_id
+        # Stages run on their own threads; their work is charged to (and profiled with) the task that submitted the job
+        self.usage = usage.current()
+        self.profile = profiler.current()
+        self.future = Future()
+        self.queued_at = 0.0
+
+
+class Pipeline:
+    """
+    Stages chained by bounded queues: while one job encodes, the next
+    downloads and the previous one uploads. run() blocks the calling
+    (consumer) thread until the job leaves the last stage, so the message
+    is only acked once everything is done.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        for stage, following in zip(stages, stages[1:]):
+            stage.next = following
+
+    def run(self, job, task_id: str, trace_id: str = None):
+        item = _Item(job, task_id, trace_id)
+        self.stages[0].put(item)
+        return item.future.result()
@@ -0,0 +1,43 @@
+from typing import Optional
+
+import msgspec
+from taskforge_worker.schema import task_decoder
+
+SUPPORTED_FORMATS = ("mp4", "webm")
+WEBM_CODECS = ("vp8", "vp9", "av1")
+# "file": one video uploaded when the encode is done; "hls": fMP4 segments uploaded as they are encoded
+OUTPUT_MODES = ("file", "hls")
+
+
+class CompressVideoPayload(msgspec.Struct, rename="camel", frozen=True):
+    video_url: str
+    format: str = "mp4"
+    bitrate: Optional[str] = None
+    preset: Optional[str] = None
+    codec: Optional[str] = None
+    output: str = "file"
+
+    def __post_init__(self):
+        if not self.video_url.startswith(("http://", "https://")):
+            raise ValueError("videoUrl must be an http(s) URL")
+        if self.format not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported format '{self.format}'")
+        if self.codec is not None and (self.format != "webm" or self.codec not in WEBM_CODECS):
+            raise ValueError(f"Unsupported codec '{self.codec}' for {self.format}")
+        if self.output not in OUTPUT_MODES:
+            raise ValueError(f"Unsupported output '{self.output}'")
+        if self.output == "hls" and self.format != "mp4":
+            raise ValueError("HLS output is only available for mp4")
+
+
+class CompressVideoTask(msgspec.Struct, rename="camel", frozen=True):
+    """Task envelope as published by the outbox publisher"""
+    id: str
+    type: str
+    payload: CompressVideoPayload
+    user_id: Optional[str] = None
+    trace_id: Optional[str] = None
+    created_at: Optional[str] = None
+
+
+decode_task = task_decoder(CompressVideoTask)
@@ -1,109 +1,198 @@
 import os
-import tempfile
-import traceback
-from app.utils.logger import log
-
-from app.ffmpeg_compressor import compress_video
-from app.s3_uploader import upload_to_s3, generate_signed_url, file_exists
-from app.redis_client import publish_result, get_cached_output, cache_task_output
-from app.utils.safe_delete import safe_delete
+import threading
+from typing import Optional
+from contextlib import ExitStack
+
+import msgspec
+from taskforge_worker.logger import log
+from taskforge_worker.s3 import upload_file, generate_signed_url, file_exists
+from taskforge_worker.redis_client import publish_result, get_cached_output, cache_task_output
+from taskforge_worker.circuit_breaker import get_breaker
+from taskforge_worker.single_flight import single_flight
+from taskforge_worker.schema import Job, TaskStatus
+from taskforge_worker import usage
+
+from app.ffmpeg_compressor import compress_video, compress_video_hls
+from app import workspace, hls
+from app.admission import Footprint, encoding
+from app.pipeline import Pipeline, Stage, PIPELINE_DOWNLOAD_WORKERS, PIPELINE_ENCODE_WORKERS, PIPELINE_UPLOAD_WORKERS, PIPELINE_QUEUE_SIZE
+from app.task_schema import CompressVideoTask, CompressVideoPayload
 
 
 logger = log(service="compress-video")
 
-def handle_task(task: dict):
-    task_id = task.get("id")
-    payload = task.get("payload", {})
-    print("payload", payload)
-    trace_id = task.get("traceId")
-    task_type = "compress-video"
+def _output_key(task: CompressVideoTask) -> str:
+    if task.payload.output == "hls":
+        return hls.playlist_key(task.id)
+    return f"compressed-videos/{task.id}.{task.payload.format}"
 
-    video_url = payload.get("videoUrl")
-    format = payload.get("format", "mp4")
 
-    s3_key = f"compressed-videos/{task_id}.{format}"
+def output_format(task: CompressVideoTask) -> str:
+    """Resource accounting label: hls streams cost differently from a single file of the same codec"""
+    return "hls" if task.payload.output == "hls" else task.payload.format
+
+
+def serve_existing(task: CompressVideoTask) -> bool:
+    """Publish an earlier result for this task if there is one; cheap, so it runs before admission"""
+    task_id = task.id
+    task_type = "compress-video"
+    s3_key = _output_key(task)
 
-    if not video_url:
-        raise ValueError("Missing 'videoUrl' in task payload")
-        
-    
     cached = get_cached_output(task_type, task_id)
     if cached:
-        publish_result(task_id, { **cached, "cached": True })
-        return
+        publish_result(task_id, msgspec.structs.replace(cached, cached=True))
+        return True
     
     if file_exists(os.getenv("S3_BUCKET_NAME"), s3_key):
         logger.info(f"♻️ Skipping task {task_id} — file already in S3")
-        signed_url = generate_signed_url(s3_key)
-        result = {
-            "success": True,
-            "url": signed_url,
-            "cached": True
-        }
+        signed_url = hls.resign(task_id) if task.payload.output == "hls" else generate_signed_url(s3_key)
+        result = TaskStatus(success=True, url=signed_url, cached=True)
         publish_result(task_id, result)
         cache_task_output(task_type, task_id, result)
-        return
-    
-    with logger.contextualize(taskId=task_id, traceId=trace_id):
-        logger.info(f"🎞️ Starting compression for task {task_id}")
-
-        try:
-            with tempfile.TemporaryDirectory() as tmpdir:
-                input_path = os.path.join(tmpdir, "input.mp4")
-                output_path = os.path.join(tmpdir, f"output.{format}")
-
-                # Download video
-                logger.info(f"⬇️ Downloading video from {video_url}")
-                publish_result(task_id, {"status": "processing", "progress": 10, "message": f"⬇️ Downloading video from {video_url}"})
-                _download_file(video_url, input_path)
-
-                options = {
-                    "format": format,                       
-                    "bitrate": payload.get("bitrate"),     
-                    "preset": payload.get("preset")       
-                }
-
-                # Compress
-                logger.info(f"⚙️ Compressing to {format}")
-                publish_result(task_id, {"status": "processing", "progress": 30, "message": f"⚙️ Compressing to {format}"})
-                compress_video(input_path, output_path, options)
-
-                # Upload to S3
-                logger.info(f"☁️ Uploading to S3")
-                publish_result(task_id, {"status": "processing", "progress": 80, "message": f"☁️ Uploading to S3"})
-                s3_url = upload_to_s3(output_path, f"compressed-videos/{task_id}.{format}")
-
-                # Publish Redis result
-                result = {
-                    "progress": 100,
-                    "success": True,
-                    "url": s3_url
-                }
-                publish_result(task_id, result)
-                cache_task_output(task_type, task_id, result)
-                logger.info(f"✅ Task {task_id} complete: {s3_url}")
-
-        except Exception as e:
-            logger.error(f"Task {task_id} failed: {e}")
-            logger.debug(traceback.format_exc())
-
-            result = {
-                "success": False,
-                "error": str(e)
-            }
-            publish_result(task_id, result)
-            raise e
-        
-        finally: 
-            # Cleanup temp file no matter what
-            safe_delete(output_path)
-
-
-def _download_file(url: str, dest_path: str):
+        return True
+
+    return False
+
+
+def handle_task(job: Job):
+    task = job.task
+    task_id = task.id
+    task_type = "compress-video"
+    s3_key = _output_key(task)
+
+    # Only one worker compresses a given output; duplicates wait for its result
+    result, shared = single_flight(
+        s3_key,
+        lambda: _compress_task(task_id, task.payload, s3_key, job.footprint, task.trace_id),
+        lambda: get_cached_output(task_type, task_id)
+    )
+    if shared:
+        logger.info(f"♻️ Reusing in-flight result for task {task_id}")
+        publish_result(task_id, msgspec.structs.replace(result, cached=True))
+
+
+class _CompressJob(msgspec.Struct):
+    """One compression as it moves through the pipeline stages"""
+    task_id: str
+    payload: CompressVideoPayload
+    s3_key: str
+    footprint: Footprint
+    resources: ExitStack
+    ws: Optional[workspace.Workspace] = None
+    # Set when the output was shipped during the encode (HLS), leaving the upload stage nothing to send
+    url: Optional[str] = None
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+def get_pipeline() -> Pipeline:
+    """Download → encode → upload stages, started on first use"""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = Pipeline([
+                    Stage("download", _download_stage, PIPELINE_DOWNLOAD_WORKERS, PIPELINE_QUEUE_SIZE),
+                    Stage("encode", _encode_stage, PIPELINE_ENCODE_WORKERS, PIPELINE_QUEUE_SIZE),
+                    Stage("upload", _upload_stage, PIPELINE_UPLOAD_WORKERS, PIPELINE_QUEUE_SIZE),
+                ])
+    return _pipeline
+
+
+def _compress_task(task_id: str, payload: CompressVideoPayload, s3_key: str, footprint: Footprint, trace_id=None) -> TaskStatus:
+    logger.info(f"🎞️ Starting compression for task {task_id}")
+
+    # The workspace is opened by the download stage and removed here once the job leaves the pipeline
+    with ExitStack() as resources:
+        job = _CompressJob(task_id, payload, s3_key, footprint, resources)
+        return get_pipeline().run(job, task_id, trace_id)
+
+
+def _download_stage(job: _CompressJob):
+    video_url = job.payload.video_url
+    # The download is only worth it if ffmpeg will take the job; the breaker may have tripped while it queued
+    get_breaker("ffmpeg").check()
+
+    # Small inputs are worked on in tmpfs, larger ones on the scratch volume
+    job.ws = ws = job.resources.enter_context(workspace.allocate(job.footprint.input_bytes))
+
+    logger.info(f"⬇️ Downloading video from {video_url} into {ws.tier} workspace")
+    publish_result(job.task_id, TaskStatus(status="processing", progress=10, message=f"⬇️ Downloading video from {video_url}"))
+    _download_file(video_url, ws.file("input.mp4"), ws.max_input_bytes)
+
+
+def _encode_stage(job: _CompressJob):
+    payload = job.payload
+    output_fmt = payload.format
+
+    options = {
+        "format": output_fmt,                       
+        "bitrate": payload.bitrate,
+        "preset": payload.preset,
+        "codec": payload.codec
+    }
+
+    # ffmpeg's memory is only reserved now, so other jobs download and upload meanwhile
+    with encoding(job.footprint):
+        if payload.output == "hls":
+            return _encode_hls(job, options)
+
+        logger.info(f"⚙️ Compressing to {output_fmt}")
+        publish_result(job.task_id, TaskStatus(status="processing", progress=30, message=f"⚙️ Compressing to {output_fmt}"))
+        get_breaker("ffmpeg").execute(lambda: compress_video(job.ws.file("input.mp4"), job.ws.file(f"output.{output_fmt}"), options))
+
+
+def _encode_hls(job: _CompressJob, options: dict):
+    """Encode to HLS segments, each shipped to S3 as soon as ffmpeg finishes it"""
+    task_id = job.task_id
+    out_dir = job.ws.file("hls")
+    os.makedirs(out_dir, exist_ok=True)
+
+    def on_playable(url):
+        publish_result(task_id, TaskStatus(status="processing", progress=50, message="▶️ Playable while encoding", url=url))
+
+    logger.info("⚙️ Compressing to HLS")
+    publish_result(task_id, TaskStatus(status="processing", progress=30, message="⚙️ Compressing to HLS"))
+    uploader = hls.SegmentUploader(task_id, out_dir, on_playable)
+    uploader.start()
+    try:
+        get_breaker("ffmpeg").execute(lambda: compress_video_hls(job.ws.file("input.mp4"), out_dir, options))
+    except BaseException:
+        uploader.stop()
+        raise
+    job.url = uploader.finish()
+
+
+def _upload_stage(job: _CompressJob) -> TaskStatus:
+    task_id = job.task_id
+    output_fmt = job.payload.format
+
+    if job.url:
+        s3_url = job.url
+    else:
+        logger.info("☁️ Uploading to S3")
+        publish_result(task_id, TaskStatus(status="processing", progress=80, message="☁️ Uploading to S3"))
+        s3_url = get_breaker("s3").execute(lambda: upload_file(job.ws.file(f"output.{output_fmt}"), job.s3_key, f"video/{output_fmt}"))
+
+    # Publish Redis result
+    result = TaskStatus(progress=100, success=True, url=s3_url)
+    publish_result(task_id, result)
+    cache_task_output("compress-video", task_id, result)
+    logger.info(f"✅ Task {task_id} complete: {s3_url}")
+    return result
+
+
+def _download_file(url: str, dest_path: str, max_bytes: int):
     import requests
     response = requests.get(url, stream=True, timeout=60)
     response.raise_for_status()
 
+    written = 0
     with open(dest_path, "wb") as f:
         for chunk in response.iter_content(chunk_size=8192):
+            written += len(chunk)
+            if written > max_bytes:
+                raise workspace.WorkspaceFullError(f"Download exceeded its {max_bytes} byte workspace reservation")
             f.write(chunk)
+    usage.add_downloaded(written)
@@ -1,12 +0,0 @@
-from loguru import logger
-import sys
-
-logger.remove()
-logger.add(
-    sys.stdout,
-    serialize=True,
-    level="INFO"
-)
-
-def log(service: str): 
-    return logger.bind(service=service)
\ No newline at end of file
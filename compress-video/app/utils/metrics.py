@@ -1,21 +1,15 @@
-from prometheus_client import (
-    Counter, 
-    generate_latest, 
-    CONTENT_TYPE_LATEST, 
-    CollectorRegistry, 
-    platform_collector,
-    process_collector,
-    gc_collector,
-    Histogram)
+from prometheus_client import Counter, Gauge, Histogram
+from taskforge_worker.metrics import registry
 
-registry = CollectorRegistry()
-gc_collector.GCCollector(registry=registry)
-platform_collector.PlatformCollector(registry=registry)
-process_collector.ProcessCollector(registry=registry)
-
-task_processed_total = Counter("task_processed_total", "Total number of task processed", ["type", "status"], registry=registry)
-task_retry_attempts_total = Counter("task_retry_attempts_total", "Total number of retry attempts", ["type"], registry=registry)
-task_dropped_total = Counter('task_dropped_total', "Tasks dropped to DLQ", ["type"], registry=registry)
-task_processing_duration_seconds = Histogram("task_processing_duration_seconds", "Time spent on task", ["type"], registry=registry)
+# compress-video specific; the shared task, dependency and runtime metrics live in taskforge_worker.metrics
 ffmpeg_failures_total = Counter("ffmpeg_failures_total", "FFmpeg-specific failures", ["codec", "format"], registry=registry)
-s3_upload_failures_total = Counter("s3_upload_failures_total", "Failures while pushing output to S3", ["type"], registry=registry)
+workspace_bytes_in_use = Gauge("workspace_bytes_in_use", "Bytes currently written to job scratch space", ["tier"], registry=registry)
+workspace_reserved_bytes = Gauge("workspace_reserved_bytes", "Scratch bytes reserved by running jobs", ["tier"], registry=registry)
+workspace_allocations_total = Counter("workspace_allocations_total", "Job workspaces allocated", ["tier"], registry=registry)
+workspace_quota_rejections_total = Counter("workspace_quota_rejections_total", "Workspace requests a tier turned away for lack of quota", ["tier"], registry=registry)
+pipeline_queue_depth = Gauge("pipeline_queue_depth", "Jobs waiting in front of a pipeline stage", ["stage"], registry=registry)
+pipeline_stage_workers = Gauge("pipeline_stage_workers", "Threads in a pipeline stage's pool", ["stage"], registry=registry)
+pipeline_stage_busy_seconds_total = Counter("pipeline_stage_busy_seconds_total", "Time stage workers spent working; rate / pipeline_stage_workers is the stage's utilization", ["stage"], registry=registry)
+pipeline_stage_wait_seconds = Histogram("pipeline_stage_wait_seconds", "Time a job queued before a stage picked it up", ["stage"], buckets=[0.01, 0.1, 1, 5, 15, 30, 60, 120, 300], registry=registry)
+hls_segments_uploaded_total = Counter("hls_segments_uploaded_total", "HLS segments uploaded while their encode was still running", registry=registry)
+hls_time_to_playable_seconds = Histogram("hls_time_to_playable_seconds", "Time from the start of an HLS encode until its playlist was announced as playable", buckets=[1, 2, 5, 10, 20, 30, 60, 120, 300], registry=registry)
@@ -0,0 +1,163 @@
+import os
+import uuid
+import fcntl
+import atexit
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from taskforge_worker.logger import log
+from app.utils.metrics import workspace_bytes_in_use, workspace_reserved_bytes, workspace_allocations_total, workspace_quota_rejections_total
+from taskforge_worker.schema import TaskValidationError
+
+logger = log("compress-video")
+
+# tmpfs pages count against the container's memory limit, so keep this quota well under it
+WORKSPACE_MEMORY_DIR = os.getenv("WORKSPACE_MEMORY_DIR", "/dev/shm/compress-video")
+WORKSPACE_MEMORY_QUOTA_BYTES = int(os.getenv("WORKSPACE_MEMORY_QUOTA_BYTES", 128 * 1024 * 1024))
+WORKSPACE_MEMORY_MAX_INPUT_BYTES = int(os.getenv("WORKSPACE_MEMORY_MAX_INPUT_BYTES", 48 * 1024 * 1024))
+WORKSPACE_DISK_DIR = os.getenv("WORKSPACE_DISK_DIR", os.path.join(tempfile.gettempdir(), "compress-video"))
+WORKSPACE_DISK_QUOTA_BYTES = int(os.getenv("WORKSPACE_DISK_QUOTA_BYTES", 8 * 1024 * 1024 * 1024))
+# Input plus output; the 720p re-encode is rarely larger than its source
+WORKSPACE_SIZE_FACTOR = float(os.getenv("WORKSPACE_SIZE_FACTOR", 2.0))
+# Reserved when the source does not report a Content-Length
+WORKSPACE_UNKNOWN_SIZE_BYTES = int(os.getenv("WORKSPACE_UNKNOWN_SIZE_BYTES", 1024 * 1024 * 1024))
+
+
+class WorkspaceFullError(Exception):
+    """Not enough free quota right now; other jobs will release theirs"""
+
+
+class Workspace:
+    def __init__(self, tier: str, path: str, reserved: int, max_input_bytes: int):
+        self.tier = tier
+        self.path = path
+        self.reserved = reserved
+        self.max_input_bytes = max_input_bytes
+
+    def file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+
+class _Tier:
+    """
+    One scratch root with a byte quota. Each process works under
+    <root>/<instance>/ and holds an flock on <instance>/.lock for its
+    lifetime, so instance dirs whose lock can be taken belong to a process
+    that crashed or was restarted and are removed on startup.
+    """
+
+    def __init__(self, name: str, root: str, quota: int):
+        self.name = name
+        self.root = root
+        self.quota = quota
+        self.reserved = 0
+        self.instance_dir = None
+        self._lock_file = None
+        workspace_reserved_bytes.labels(tier=name).set(0)
+        workspace_bytes_in_use.labels(tier=name).set_function(self.bytes_in_use)
+
+    def available(self) -> bool:
+        return self.quota > 0 and self._ensure_instance_dir()
+
+    def _ensure_instance_dir(self) -> bool:
+        if self.instance_dir:
+            return True
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            self._remove_stale()
+            instance_dir = os.path.join(self.root, f"{os.getpid()}-{uuid.uuid4().hex[:8]}")
+            os.makedirs(instance_dir)
+            self._lock_file = open(os.path.join(instance_dir, ".lock"), "w")
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as e:
+            logger.warning(f"⚠️ {self.name} workspace at {self.root} unavailable: {e}")
+            self.quota = 0
+            return False
+        self.instance_dir = instance_dir
+        atexit.register(shutil.rmtree, instance_dir, True)
+        return True
+
+    def _remove_stale(self):
+        for entry in os.scandir(self.root):
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            try:
+                with open(os.path.join(entry.path, ".lock"), "a") as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue  # owned by a live process
+            except OSError:
+                pass
+            shutil.rmtree(entry.path, ignore_errors=True)
+            logger.info(f"🧹 Removed stale workspace {entry.path}")
+
+    def bytes_in_use(self) -> int:
+        if not self.instance_dir:
+            return 0
+        total = 0
+        for dirpath, _, filenames in os.walk(self.instance_dir):
+            for filename in filenames:
+                try:
+                    total += os.lstat(os.path.join(dirpath, filename)).st_size
+                except OSError:
+                    pass
+        return total
+
+
+_memory = _Tier("memory", WORKSPACE_MEMORY_DIR, WORKSPACE_MEMORY_QUOTA_BYTES)
+_disk = _Tier("disk", WORKSPACE_DISK_DIR, WORKSPACE_DISK_QUOTA_BYTES)
+_lock = threading.Lock()
+
+
+def _reserve(input_bytes):
+    """Pick a tier for a job whose input is `input_bytes` (None if unknown) and reserve its share"""
+    known = input_bytes is not None
+    needed = int(input_bytes * WORKSPACE_SIZE_FACTOR) if known else WORKSPACE_UNKNOWN_SIZE_BYTES
+
+    if known and needed > WORKSPACE_DISK_QUOTA_BYTES:
+        workspace_quota_rejections_total.labels(tier="disk").inc()
+        raise TaskValidationError(f"Input of {input_bytes} bytes exceeds the workspace quota")
+
+    with _lock:
+        for tier in (_memory, _disk):
+            if tier is _memory and (not known or input_bytes > WORKSPACE_MEMORY_MAX_INPUT_BYTES):
+                continue
+            if not tier.available():
+                continue
+            if tier.reserved + needed > tier.quota:
+                workspace_quota_rejections_total.labels(tier=tier.name).inc()
+                continue
+            tier.reserved += needed
+            workspace_reserved_bytes.labels(tier=tier.name).set(tier.reserved)
+            return tier, needed
+
+    raise WorkspaceFullError(f"No workspace quota free for {needed} bytes")
+
+
+@contextmanager
+def allocate(input_bytes=None):
+    """
+    Scratch directory for one job, on tmpfs for small inputs and on the
+    scratch volume otherwise. The directory and its reservation are released
+    on exit whatever happens inside the block.
+    """
+    tier, reserved = _reserve(input_bytes)
+    path = tempfile.mkdtemp(prefix="job-", dir=tier.instance_dir)
+    workspace_allocations_total.labels(tier=tier.name).inc()
+    # Whatever the output needs is the remainder; the download must not eat into it
+    max_input_bytes = input_bytes if input_bytes is not None else int(reserved / WORKSPACE_SIZE_FACTOR)
+    try:
+        yield Workspace(tier.name, path, reserved, max_input_bytes)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+        with _lock:
+            tier.reserved -= reserved
+            workspace_reserved_bytes.labels(tier=tier.name).set(tier.reserved)
+
+
+def init_workspaces():
+    """Create this process's instance dirs and sweep ones left by crashed processes"""
+    for tier in (_memory, _disk):
+        tier.available()
@@ -0,0 +1,103 @@
+"""
+Benchmark the compression profiles on a reference clip.
+
+Encodes the clip once per format/codec/tier through the same code path the
+worker uses and reports wall time, realtime factor, output size and SSIM
+against the source scaled to the output height. Use it to re-check the
+WEBM_PROFILES tiers and WEBM_DEFAULT_TIER after changing them or the
+ffmpeg build, and before making vp9 or av1 the WEBM_VIDEO_CODEC default.
+
+    python benchmark_profiles.py reference.mp4
+    python benchmark_profiles.py --generate 30 --profiles webm:vp9:balanced,mp4::fast
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+import ffmpeg
+
+from app.ffmpeg_compressor import compress_video, encoder_args, OUTPUT_HEIGHT, TIERS
+
+# vp8 is the webm default today, the baseline the vp9/av1 tiers have to beat
+DEFAULT_PROFILES = ["mp4::fast", "webm:vp8:"] + [f"webm:{codec}:{tier}" for codec in ("vp9", "av1") for tier in TIERS]
+
+
+def generate_clip(path: str, seconds: int):
+    """1080p30 synthetic clip with motion, fine detail and a tone; deterministic across runs"""
+    video = ffmpeg.input(f"testsrc2=size=1920x1080:rate=30:duration={seconds}", f="lavfi")
+    audio = ffmpeg.input(f"sine=frequency=440:duration={seconds}", f="lavfi")
+    ffmpeg.output(video, audio, path, vcodec="libx264", crf=12, preset="veryfast", acodec="aac").overwrite_output().run(quiet=True)
+
+
+def ssim(source: str, encoded: str):
+    ref = ffmpeg.input(source).video.filter("scale", -2, OUTPUT_HEIGHT)
+    out = ffmpeg.input(encoded).video
+    _, stderr = ffmpeg.filter([out, ref], "ssim").output("-", f="null").run(quiet=True)
+    for line in reversed(stderr.decode(errors="replace").splitlines()):
+        if "All:" in line:
+            return float(line.split("All:")[1].split()[0])
+    return None
+
+
+def run(clip: str, profile: str, bitrate: str, workdir: str) -> dict:
+    output_fmt, codec, preset = (profile.split(":") + ["", ""])[:3]
+    options = {"format": output_fmt, "bitrate": bitrate, "preset": preset or None, "codec": codec or None}
+    output = os.path.join(workdir, f"{profile.replace(':', '_')}.{output_fmt}")
+
+    encoder = encoder_args(output_fmt, options["preset"], options["codec"])["vcodec"]
+    started = time.perf_counter()
+    try:
+        compress_video(clip, output, options)
+    except RuntimeError:
+        # Typically an encoder this ffmpeg build lacks (libsvtav1); keep the other profiles' numbers
+        return {"profile": profile, "encoder": encoder, "failed": True}
+    elapsed = time.perf_counter() - started
+
+    duration = float(ffmpeg.probe(clip)["format"]["duration"])
+    return {
+        "profile": profile,
+        "encoder": encoder,
+        "seconds": round(elapsed, 2),
+        "realtimeFactor": round(duration / elapsed, 2),
+        "bytes": os.path.getsize(output),
+        "ssim": ssim(clip, output),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("clip", nargs="?", help="reference clip (omit with --generate)")
+    parser.add_argument("--generate", type=int, metavar="SECONDS", help="synthesize a 1080p reference clip of this length")
+    parser.add_argument("--profiles", default=",".join(DEFAULT_PROFILES), help="comma-separated format:codec:preset entries")
+    parser.add_argument("--bitrate", default="1000k")
+    parser.add_argument("--json", action="store_true", help="print results as JSON only")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="compress-bench-") as workdir:
+        clip = args.clip
+        if not clip:
+            if not args.generate:
+                sys.exit("Pass a reference clip or --generate SECONDS")
+            clip = os.path.join(workdir, "reference.mp4")
+            generate_clip(clip, args.generate)
+
+        results = [run(clip, profile, args.bitrate, workdir) for profile in args.profiles.split(",")]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'profile':<22} {'encoder':<12} {'seconds':>8} {'x realtime':>10} {'MB':>8} {'SSIM':>7}")
+    for r in results:
+        if r.get("failed"):
+            print(f"{r['profile']:<22} {r['encoder']:<12} {'encode failed, see the log above':>37}")
+            continue
+        ssim_text = f"{r['ssim']:.4f}" if r["ssim"] is not None else "-"
+        print(f"{r['profile']:<22} {r['encoder']:<12} {r['seconds']:>8} {r['realtimeFactor']:>10} {r['bytes'] / 1e6:>8.2f} {ssim_text:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,43 @@
+# Must come first so STARTUP_PROFILE=true can time every import below
+from taskforge_worker import startup
+startup.enable_import_profiling(("app.",))
+
 import os
-import threading
 from dotenv import load_dotenv
 
-from app.consumer import start_consumer
-from app.metrics_server import app
+def build_worker(**overrides):
+    """The compress-video Worker; overrides (e.g. queue, routing_key) are passed on, see mixed-worker/"""
+    from taskforge_worker.runner import Worker
+    from app.task_schema import decode_task
+    from app.task_worker import handle_task, serve_existing, output_format
+    from app.admission import estimate, BUDGET_DEFAULTS
+    from app.workspace import init_workspaces
+
+    return Worker(
+        "compress-video",
+        decode=decode_task,
+        handler=handle_task,
+        lookup=serve_existing,
+        estimate=estimate,
+        output_format=output_format,
+        budgets=BUDGET_DEFAULTS,
+        dependencies=("ffmpeg", "s3"),
+        output_prefix="compressed-videos/",
+        warm=init_workspaces,
+        metrics_port=int(os.getenv("PORT", 8100)),
+        **overrides,
+    )
 
-def run_metrics_server():
-    """Run the metrics server in a separate thread"""
-    port = int(os.getenv('PORT', '8100'))
-    print(f'Starting metrics server on port {port}')
-    try:
-        app.run(host='0.0.0.0', port=port, debug=False)
-    except Exception as e:
-        print(f'Metrics server failed to start: {e}')
 
 if __name__ == "__main__":
     load_dotenv()
-    
-    # Start metrics server in background thread
-    metrics_thread = threading.Thread(target=run_metrics_server, daemon=True)
-    metrics_thread.start()
-    
-    # Start the main RabbitMQ worker (blocking)
+
+    worker = build_worker()
+
+    # Start the main RabbitMQ worker (blocking); the metrics server follows once subscribed
     print('Starting RabbitMQ worker...')
     try:
-        start_consumer()
+        worker.run()
     except Exception as e:
         print(f'Worker failed to start: {e}')
-        exit(1)
\ No newline at end of file
+        exit(1)
@@ -1,30 +1,36 @@
-import os
-import threading
+# Must come first so STARTUP_PROFILE=true can time every import below
+from taskforge_worker import startup
+startup.enable_import_profiling()
+
 from dotenv import load_dotenv
 
-from task_worker import start_worker
-from metrics_server import app
+def build_worker(**overrides):
+    """The generate-pdf Worker; overrides (e.g. queue, routing_key) are passed on, see mixed-worker/"""
+    from taskforge_worker.runner import Worker
+    from task_schema import decode_task
+    from task_worker import handle_task, serve_existing
+
+    return Worker(
+        "generate-pdf",
+        decode=decode_task,
+        handler=handle_task,
+        lookup=serve_existing,
+        output_format=lambda task: "pdf",
+        dependencies=("renderer",),
+        output_prefix="pdf/",
+        **overrides,
+    )
 
-def run_metrics_server():
-    """Run the metrics server in a separate thread"""
-    port = int(os.getenv('PORT', '8000'))
-    print(f'Starting metrics server on port {port}')
-    try:
-        app.run(host='0.0.0.0', port=port, debug=False) 
-    except Exception as e:
-        print(f'Metrics server failed to start: {e}')
 
 if __name__ == "__main__":
     load_dotenv()
-    
-    # Start metrics server in background thread
-    metrics_thread = threading.Thread(target=run_metrics_server, daemon=True)
-    metrics_thread.start()
-    
-    # Start the main RabbitMQ worker (blocking)
+
+    worker = build_worker()
+
+    # Start the main RabbitMQ worker (blocking); the metrics server follows once subscribed
     print('Starting RabbitMQ worker...')
     try:
-        start_worker()
+        worker.run()
     except Exception as e:
         print(f'Worker failed to start: {e}')
-        exit(1)
\ No newline at end of file
+        exit(1)
@@ -0,0 +1,16 @@
+from prometheus_client import Counter, Gauge, Histogram
+from taskforge_worker.metrics import registry
+
+# generate-pdf specific; the shared task, dependency and runtime metrics live in taskforge_worker.metrics
+render_cache_lookups_total = Counter(
+    "render_cache_lookups_total",
+    "Render cache lookups by result: hit (fresh), revalidated (source answered 304), changed (source answered 200), "
+    "unvalidated (stale with no validators), miss (no usable entry)",
+    ["result"],
+    registry=registry,
+)
+renderer_requests_total = Counter("renderer_requests_total", "Requests to a chromium-renderer endpoint by outcome (success, failure, rejected, cancelled)", ["endpoint", "outcome"], registry=registry)
+renderer_request_duration_seconds = Histogram("renderer_request_duration_seconds", "Successful render time per chromium-renderer endpoint", ["endpoint"], buckets=[0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60], registry=registry)
+renderer_outstanding_requests = Gauge("renderer_outstanding_requests", "Requests in flight to a chromium-renderer endpoint", ["endpoint"], registry=registry)
+renderer_endpoint_ejected = Gauge("renderer_endpoint_ejected", "1 while a chromium-renderer endpoint is ejected for failing or being slow", ["endpoint"], registry=registry)
+renderer_hedges_total = Counter("renderer_hedges_total", "Hedged renders by result: won, lost, or not sent (over_budget, no_endpoint)", ["result"], registry=registry)
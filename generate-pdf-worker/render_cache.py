@@ -0,0 +1,144 @@
+import os
+import time
+import hashlib
+import json
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import msgspec
+from taskforge_worker.logger import log
+from taskforge_worker.redis_client import get_redis
+from taskforge_worker.s3 import file_exists
+from metrics import render_cache_lookups_total
+
+logger = log("generate-pdf")
+
+# How long a rendered PDF is reused without asking the source whether it changed; tasks override it with maxAge
+RENDER_CACHE_MAX_AGE = int(os.getenv("RENDER_CACHE_MAX_AGE", 300))
+# How long an entry (and so the chance to revalidate it) is kept; keep it under the S3 lifecycle for pdf/
+RENDER_CACHE_TTL = int(os.getenv("RENDER_CACHE_TTL", 86400))
+# Conditional requests are a cheap check; a slow source is treated as changed rather than holding up the task
+REVALIDATE_TIMEOUT_SECONDS = float(os.getenv("RENDER_REVALIDATE_TIMEOUT", 5))
+
+# What chromium-renderer's page.pdf() uses unless the task overrides it
+DEFAULT_PDF_OPTIONS = {"format": "A4", "printBackground": True}
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class RenderEntry(msgspec.Struct, rename="camel", omit_defaults=True):
+    s3_key: str
+    validated_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class Validators(msgspec.Struct, frozen=True):
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+_decode_entry = msgspec.json.Decoder(RenderEntry)
+
+
+def effective_options(pdf_options) -> dict:
+    """The task's PdfOptions (only the ones it set) over the renderer defaults, as sent to chromium-renderer"""
+    return {**DEFAULT_PDF_OPTIONS, **msgspec.to_builtins(pdf_options or {})}
+
+
+def normalize_url(url: str) -> str:
+    """Spellings of the same page map to one key: case of scheme/host, default port, query order, fragment"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def cache_key(url: str, pdf_options) -> str:
+    options = json.dumps(effective_options(pdf_options), sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(f"{normalize_url(url)}\n{options}".encode()).hexdigest()
+    return f"render:{digest}"
+
+
+def _validators(response) -> Validators:
+    return Validators(etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"))
+
+
+def _request_source(url: str, headers: dict = None):
+    # Imported lazily like pdf_service; stream=True so only the headers are read, never the body
+    import requests
+
+    response = requests.get(url, headers=headers or {}, stream=True, timeout=REVALIDATE_TIMEOUT_SECONDS, allow_redirects=True)
+    response.close()
+    return response
+
+
+def source_validators(url: str) -> Validators:
+    """ETag/Last-Modified of the page as it is now, taken just before rendering it"""
+    try:
+        response = _request_source(url)
+    except Exception as e:
+        logger.warning(f"Could not read validators for {url}: {e!r}")
+        return Validators()
+    return _validators(response) if response.status_code == 200 else Validators()
+
+
+def lookup(url: str, pdf_options, max_age: Optional[int] = None) -> Optional[str]:
+    """S3 key of a stored render of this page and options that is still current, or None to render"""
+    key = cache_key(url, pdf_options)
+    max_age = RENDER_CACHE_MAX_AGE if max_age is None else max_age
+
+    raw = get_redis().get(key)
+    entry = _decode_entry.decode(raw) if raw else None
+    # The index answers for our own prefix; a lifecycle rule may have removed the object under the entry
+    if entry is None or not file_exists(os.getenv("S3_BUCKET_NAME"), entry.s3_key):
+        render_cache_lookups_total.labels(result="miss").inc()
+        return None
+
+    age = time.time() - entry.validated_at
+    if age <= max_age:
+        render_cache_lookups_total.labels(result="hit").inc()
+        logger.bind(event="cache").info(f"Render cache hit ({age:.0f}s old) → {entry.s3_key}")
+        return entry.s3_key
+
+    if not entry.etag and not entry.last_modified:
+        render_cache_lookups_total.labels(result="unvalidated").inc()
+        return None
+
+    headers = {}
+    if entry.etag:
+        headers["If-None-Match"] = entry.etag
+    if entry.last_modified:
+        headers["If-Modified-Since"] = entry.last_modified
+    try:
+        response = _request_source(url, headers)
+    except Exception as e:
+        logger.warning(f"Revalidating {url} failed, rendering again: {e!r}")
+        render_cache_lookups_total.labels(result="changed").inc()
+        return None
+
+    if response.status_code != 304:
+        render_cache_lookups_total.labels(result="changed").inc()
+        return None
+
+    entry.validated_at = time.time()
+    get_redis().setex(key, RENDER_CACHE_TTL, msgspec.json.encode(entry))
+    render_cache_lookups_total.labels(result="revalidated").inc()
+    logger.bind(event="cache").info(f"Source unchanged (304), reusing {entry.s3_key}")
+    return entry.s3_key
+
+
+def store(url: str, pdf_options, s3_key: str, validators: Validators, rendered_at: float):
+    """
+    Remember a fresh render. rendered_at is when the validators were read,
+    i.e. before the render, so the entry never claims to be newer than it is.
+    """
+    entry = RenderEntry(s3_key=s3_key, validated_at=rendered_at, etag=validators.etag, last_modified=validators.last_modified)
+    try:
+        get_redis().setex(cache_key(url, pdf_options), RENDER_CACHE_TTL, msgspec.json.encode(entry))
+    except Exception as e:
+        # The task already succeeded; a lost entry only costs a render later
+        logger.warning(f"Could not store render cache entry for {url}: {e!r}")
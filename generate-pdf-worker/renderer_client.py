@@ -0,0 +1,331 @@
+import os
+import json
+import time
+import queue
+import random
+import socket
+import threading
+import http.client
+from collections import deque
+from urllib.parse import urlsplit
+
+from taskforge_worker.logger import log
+from taskforge_worker import profiler
+from metrics import (
+    renderer_requests_total, renderer_request_duration_seconds, renderer_outstanding_requests,
+    renderer_endpoint_ejected, renderer_hedges_total,
+)
+from config import CHROMIUM_RENDERER_URLS, CHROMIUM_RENDERER_TOKEN
+
+logger = log("generate-pdf")
+
+# Whole render, hedges included
+RENDERER_TIMEOUT_SECONDS = float(os.getenv("RENDERER_TIMEOUT", 60))
+# A request still running at this percentile of recent render times gets a hedge on another endpoint
+RENDERER_HEDGE_PERCENTILE = float(os.getenv("RENDERER_HEDGE_PERCENTILE", 0.95))
+# Never hedge sooner than this, however fast renders have been
+RENDERER_HEDGE_MIN_SECONDS = float(os.getenv("RENDERER_HEDGE_MIN_SECONDS", 2))
+# Hedges allowed as a fraction of requests, so a fleet-wide slowdown does not double the load on it
+RENDERER_HEDGE_BUDGET = float(os.getenv("RENDERER_HEDGE_BUDGET", 0.1))
+# Render times the percentile is taken over; no hedging until this many have been seen
+RENDERER_LATENCY_WINDOW = int(os.getenv("RENDERER_LATENCY_WINDOW", 200))
+RENDERER_HEDGE_MIN_SAMPLES = 20
+# Consecutive failed or too-slow requests that take an endpoint out of rotation
+RENDERER_EJECT_AFTER = int(os.getenv("RENDERER_EJECT_AFTER", 3))
+# First ejection period; doubles (up to 8x) while the endpoint keeps failing right after readmission
+RENDERER_EJECT_SECONDS = float(os.getenv("RENDERER_EJECT_SECONDS", 30))
+# Hostnames are re-resolved this often, so a headless service's pod IPs follow scale events
+RENDERER_RESOLVE_SECONDS = float(os.getenv("RENDERER_RESOLVE_SECONDS", 30))
+
+_BUDGET_WINDOW_SECONDS = 60
+
+
+class RendererUnavailable(Exception):
+    pass
+
+
+class Endpoint:
+    def __init__(self, url: str, host: str):
+        self.url = url
+        self.host = host  # Host header; url may hold a resolved pod IP
+        self.outstanding = 0
+        self.bad = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        renderer_outstanding_requests.labels(endpoint=url).set_function(lambda: self.outstanding)
+        renderer_endpoint_ejected.labels(endpoint=url).set_function(lambda: 1 if time.time() < self.ejected_until else 0)
+
+    def retire(self):
+        renderer_outstanding_requests.remove(self.url)
+        renderer_endpoint_ejected.remove(self.url)
+
+
+class _Attempt:
+    __slots__ = ("endpoint", "hedge", "started", "conn", "cancelled")
+
+    def __init__(self, endpoint: Endpoint, hedge: bool):
+        self.endpoint = endpoint
+        self.hedge = hedge
+        self.started = time.monotonic()
+        self.conn = None
+        self.cancelled = False
+
+    def cancel(self):
+        """Drop the connection; chromium-renderer aborts a render whose client went away"""
+        self.cancelled = True
+        conn = self.conn
+        if conn is not None and conn.sock is not None:
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class RendererClient:
+    """
+    Spreads renders over every chromium-renderer endpoint.
+
+    Endpoints come from CHROMIUM_RENDERER_URLS; each http hostname is
+    resolved to all of its addresses, so a headless service yields one
+    endpoint per pod. A request goes to the endpoint with the fewest
+    requests outstanding. If it is still running once it passes the
+    RENDERER_HEDGE_PERCENTILE of recent render times, the same render is
+    sent to a second endpoint; the first good answer wins and the other
+    connection is dropped. Endpoints that fail or are too slow several
+    times in a row are ejected for a while and then readmitted; at most
+    half of them are ever out at once.
+    """
+
+    def __init__(self, urls):
+        self.urls = list(urls)
+        self.endpoints = {}
+        self.latencies = deque(maxlen=RENDERER_LATENCY_WINDOW)
+        self.requests = deque()
+        self.hedges = deque()
+        self.lock = threading.Lock()
+        self.resolved_at = 0.0
+
+    # -- endpoints --------------------------------------------------------
+
+    def _resolve(self):
+        found = {}
+        for url in self.urls:
+            parts = urlsplit(url)
+            port = parts.port or (443 if parts.scheme == "https" else 80)
+            addresses = [parts.hostname]
+            # https keeps the hostname for certificate checks; plain http can dial pod IPs directly
+            if parts.scheme == "http":
+                try:
+                    infos = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+                    addresses = sorted({info[4][0] for info in infos})
+                except socket.gaierror as e:
+                    logger.warning(f"Could not resolve renderer host {parts.hostname}: {e!r}")
+                    return None
+            for address in addresses:
+                netloc = f"[{address}]:{port}" if ":" in address else f"{address}:{port}"
+                found[f"{parts.scheme}://{netloc}{parts.path.rstrip('/')}"] = parts.netloc
+        return found
+
+    def _refresh(self):
+        if time.monotonic() - self.resolved_at < RENDERER_RESOLVE_SECONDS and self.endpoints:
+            return
+        self.resolved_at = time.monotonic()
+        found = self._resolve()
+        if not found:
+            # Keep what we had; a DNS blip should not take every endpoint away
+            return
+
+        with self.lock:
+            for url in set(self.endpoints) - set(found):
+                if self.endpoints[url].outstanding == 0:
+                    self.endpoints.pop(url).retire()
+            for url, host in found.items():
+                if url not in self.endpoints:
+                    self.endpoints[url] = Endpoint(url, host)
+                    logger.info(f"Renderer endpoint added: {url}")
+
+    def _pick(self, exclude=None):
+        now = time.time()
+        with self.lock:
+            others = [e for e in self.endpoints.values() if e is not exclude]
+            # With everything ejected, a possibly-slow endpoint beats failing the task
+            candidates = [e for e in others if now >= e.ejected_until] or others
+            if not candidates:
+                return None
+            fewest = min(e.outstanding for e in candidates)
+            endpoint = random.choice([e for e in candidates if e.outstanding == fewest])
+            endpoint.outstanding += 1
+            return endpoint
+
+    def _finished(self, attempt: _Attempt, outcome: str, duration: float, slow: bool):
+        endpoint = attempt.endpoint
+        renderer_requests_total.labels(endpoint=endpoint.url, outcome=outcome).inc()
+        if outcome == "success":
+            renderer_request_duration_seconds.labels(endpoint=endpoint.url).observe(duration)
+
+        with self.lock:
+            endpoint.outstanding -= 1
+            if outcome == "success":
+                self.latencies.append(duration)
+            if outcome == "success" and not slow:
+                endpoint.bad = 0
+                endpoint.ejections = 0
+                return
+            if outcome == "rejected" or (outcome == "cancelled" and attempt.hedge):
+                # The task's fault, or a hedge that simply started later; says nothing about the endpoint
+                return
+
+            endpoint.bad += 1
+            if endpoint.bad < RENDERER_EJECT_AFTER:
+                return
+            now = time.time()
+            ejected = sum(1 for e in self.endpoints.values() if now < e.ejected_until)
+            if now < endpoint.ejected_until or (ejected + 1) * 2 > len(self.endpoints):
+                return
+            period = RENDERER_EJECT_SECONDS * min(2 ** endpoint.ejections, 8)
+            endpoint.ejected_until = now + period
+            endpoint.ejections += 1
+            endpoint.bad = 0
+        logger.warning(f"⏏️ Ejected renderer {endpoint.url} for {period:.0f}s after {RENDERER_EJECT_AFTER} bad requests")
+
+    # -- hedging ----------------------------------------------------------
+
+    def hedge_after(self):
+        """Seconds after which a request is hedged, or None while there is too little data"""
+        with self.lock:
+            if len(self.latencies) < RENDERER_HEDGE_MIN_SAMPLES:
+                return None
+            samples = sorted(self.latencies)
+        index = min(len(samples) - 1, int(len(samples) * RENDERER_HEDGE_PERCENTILE))
+        return max(RENDERER_HEDGE_MIN_SECONDS, samples[index])
+
+    def _within_budget(self) -> bool:
+        cutoff = time.monotonic() - _BUDGET_WINDOW_SECONDS
+        with self.lock:
+            for stamps in (self.requests, self.hedges):
+                while stamps and stamps[0] < cutoff:
+                    stamps.popleft()
+            if len(self.hedges) + 1 > RENDERER_HEDGE_BUDGET * len(self.requests):
+                return False
+            self.hedges.append(time.monotonic())
+            return True
+
+    # -- requests ---------------------------------------------------------
+
+    def _post(self, attempt: _Attempt, body: bytes):
+        parts = urlsplit(attempt.endpoint.url)
+        connection = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        # http.client rather than requests: cancelling needs the in-flight request's socket
+        conn = connection(parts.hostname, parts.port, timeout=RENDERER_TIMEOUT_SECONDS)
+        attempt.conn = conn
+        try:
+            conn.connect()
+            if attempt.cancelled:
+                raise ConnectionAbortedError("cancelled")
+            conn.request("POST", f"{parts.path}/render/pdf", body=body, headers={
+                "Host": attempt.endpoint.host,
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {CHROMIUM_RENDERER_TOKEN}",
+            })
+            response = conn.getresponse()
+            return response.status, response.read()
+        finally:
+            conn.close()
+
+    def _run(self, attempt: _Attempt, body: bytes, results: queue.Queue, slow_after, profile):
+        status, data, error = None, None, None
+        # Profiled with the task that sent it; stopped before the result is handed over so it is in the task's profile
+        with profiler.activate(profile):
+            try:
+                status, data = self._post(attempt, body)
+            except Exception as e:
+                error = e
+
+            duration = time.monotonic() - attempt.started
+            if attempt.cancelled:
+                outcome = "cancelled"
+            elif error is not None or status >= 500:
+                outcome = "failure"
+            elif status != 200:
+                outcome = "rejected"
+            else:
+                outcome = "success"
+            self._finished(attempt, outcome, duration, slow_after is not None and duration > slow_after)
+        results.put((attempt, status, data, error))
+
+    def _start(self, body: bytes, results: queue.Queue, slow_after, exclude=None, hedge=False):
+        endpoint = self._pick(exclude)
+        if endpoint is None:
+            return None
+        attempt = _Attempt(endpoint, hedge)
+        args = (attempt, body, results, slow_after, profiler.current())
+        threading.Thread(target=self._run, args=args, name="renderer-request", daemon=True).start()
+        return attempt
+
+    def render_pdf(self, task_id: str, url: str, options: dict) -> dict:
+        """POST /render/pdf, hedged; returns the renderer's JSON answer"""
+        self._refresh()
+        body = json.dumps({"url": url, "task_id": task_id, "options": options}).encode()
+        deadline = time.monotonic() + RENDERER_TIMEOUT_SECONDS
+        hedge_after = self.hedge_after()
+        results = queue.Queue()
+
+        with self.lock:
+            self.requests.append(time.monotonic())
+        primary = self._start(body, results, hedge_after)
+        if primary is None:
+            raise RendererUnavailable("No chromium-renderer endpoints")
+        pending = [primary]
+        error = None
+
+        while pending:
+            now = time.monotonic()
+            wait = deadline - now
+            if hedge_after is not None:
+                wait = min(wait, primary.started + hedge_after - now)
+            try:
+                attempt, status, data, failure = results.get(timeout=max(0.0, wait))
+            except queue.Empty:
+                if time.monotonic() >= deadline:
+                    break
+                hedge_after = None
+                if not self._within_budget():
+                    renderer_hedges_total.labels(result="over_budget").inc()
+                    continue
+                hedge = self._start(body, results, None, exclude=primary.endpoint, hedge=True)
+                if hedge is None:
+                    renderer_hedges_total.labels(result="no_endpoint").inc()
+                    continue
+                logger.info(f"Hedging render on {hedge.endpoint.url}; {primary.endpoint.url} is past the hedge threshold")
+                pending.append(hedge)
+                continue
+
+            pending.remove(attempt)
+            if failure is None and status == 200:
+                for loser in pending:
+                    loser.cancel()
+                if len(pending) or attempt.hedge:
+                    renderer_hedges_total.labels(result="won" if attempt.hedge else "lost").inc()
+                return json.loads(data)
+            error = failure or Exception(f"Renderer failed: {status} - {data.decode(errors='replace')}")
+            if status is not None and status < 500:
+                # The request itself is bad; another endpoint would say the same
+                break
+
+        for attempt in pending:
+            attempt.cancel()
+        if error is None:
+            raise TimeoutError(f"Render not finished within {RENDERER_TIMEOUT_SECONDS:.0f}s")
+        raise error
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_renderer_client() -> RendererClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = RendererClient(CHROMIUM_RENDERER_URLS)
+        return _client
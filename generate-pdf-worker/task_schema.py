@@ -0,0 +1,67 @@
+from typing import Optional, Union
+
+import msgspec
+from taskforge_worker.schema import task_decoder
+
+# Paper formats page.pdf() knows; compared case-insensitively like Puppeteer does
+PAPER_FORMATS = ("letter", "legal", "tabloid", "ledger", "a0", "a1", "a2", "a3", "a4", "a5", "a6")
+
+# CSS length ("1cm", "20px") or a number of pixels
+Length = Union[str, float]
+
+
+class PdfMargin(msgspec.Struct, frozen=True, forbid_unknown_fields=True, omit_defaults=True):
+    top: Optional[Length] = None
+    right: Optional[Length] = None
+    bottom: Optional[Length] = None
+    left: Optional[Length] = None
+
+
+class PdfOptions(msgspec.Struct, rename="camel", frozen=True, forbid_unknown_fields=True, omit_defaults=True):
+    """
+    The page.pdf() options a task may set. Anything else (path, timeout, ...)
+    fails validation rather than reaching the renderer, which drops unknown
+    keys as well.
+    """
+    format: Optional[str] = None
+    landscape: Optional[bool] = None
+    margin: Optional[PdfMargin] = None
+    scale: Optional[float] = None
+    print_background: Optional[bool] = None
+    page_ranges: Optional[str] = None
+    width: Optional[Length] = None
+    height: Optional[Length] = None
+    prefer_css_page_size: Optional[bool] = msgspec.field(default=None, name="preferCSSPageSize")
+
+    def __post_init__(self):
+        if self.format is not None and self.format.lower() not in PAPER_FORMATS:
+            raise ValueError(f"Unsupported paper format '{self.format}'")
+        # Chrome's own bounds for the print scale
+        if self.scale is not None and not 0.1 <= self.scale <= 2:
+            raise ValueError("scale must be between 0.1 and 2")
+
+
+class GeneratePdfPayload(msgspec.Struct, rename="camel", frozen=True):
+    url: str
+    pdf_options: PdfOptions = msgspec.field(default_factory=PdfOptions)
+    # Seconds a stored render of the same page may be reused without revalidating; 0 always asks the source
+    max_age: Optional[int] = None
+
+    def __post_init__(self):
+        if not self.url.startswith(("http://", "https://")):
+            raise ValueError("url must be an http(s) URL")
+        if self.max_age is not None and self.max_age < 0:
+            raise ValueError("maxAge must not be negative")
+
+
+class GeneratePdfTask(msgspec.Struct, rename="camel", frozen=True):
+    """Task envelope as published by the outbox publisher"""
+    id: str
+    type: str
+    payload: GeneratePdfPayload
+    user_id: Optional[str] = None
+    trace_id: Optional[str] = None
+    created_at: Optional[str] = None
+
+
+decode_task = task_decoder(GeneratePdfTask)
@@ -1,144 +1,86 @@
-import json
-import time
 import os
-import traceback
+import time
+import msgspec
+import render_cache
 from pdf_service import generate_pdf
-from redis_publisher import publish_status, cache_task_output, get_cached_output
-from s3_uploader import generate_signed_url, file_exists
-from utils.logger import log
-from rabbitmq_consumer import connect_and_consume, QUEUE_NAME, ROUTING_KEY, EXCHANGE_NAME
-from utils.metrics import (task_processed_total, task_retry_attempts_total, task_dropped_total, task_processing_duration_seconds)
-from utils.consumer_circuitbreaker import circuitbreaker
-
-MAX_RETRIES = 3
-RABBITMQ_CONNECTION_RETRY = 10
-RETRY_DELAY_SECONDS = 3
+from taskforge_worker.redis_client import publish_status, publish_result, cache_task_output, get_cached_output
+from taskforge_worker.s3 import generate_signed_url, file_exists, record_key
+from taskforge_worker.logger import log
+from taskforge_worker.circuit_breaker import get_breaker
+from taskforge_worker.single_flight import single_flight
+from taskforge_worker.schema import Job, TaskStatus
+from task_schema import GeneratePdfTask
 
 logger = log("generate-pdf")
 
-def get_retry_count(properties):
-    headers = properties.headers or {}
-    x_death = headers.get("x-death", [])
-    for death in x_death:
-        if death.get("queue") == f"{QUEUE_NAME}.retry":
-            return death.get("count", 0)
-    return 0
-
-def handle_message(ch, method, properties, body):
-    task = json.loads(body)
-    task_id = task["id"]
-    trace_id = task["traceId"]
-    user_id = task["userId"]
-    url = task["payload"]["url"]
-    pdf_options = task["payload"].get("pdfOptions", {})
-    task_type = "generate-pdf"
-
-    with logger.contextualize(taskId=task_id, traceId=trace_id):
-
-        start_time = time.time()
-        
-        try:
-            retry_count = get_retry_count(properties)
-            ### check if cached
-            cached = get_cached_output(task_type, task_id)
-            if cached:
-                publish_status(task_id, { **cached, "cached": True })
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                return
-            
-            s3_key = f"pdf/{task_id}.{format}"
-
-            if file_exists(os.getenv("S3_BUCKET_NAME"), s3_key):
-                logger.info(f"Skipping task {task_id} — file already in S3")
-                signed_url = generate_signed_url(s3_key)
-                result = {
-                    "success": True,
-                    "url": signed_url,
-                    "cached": True
-                }
-                publish_status(task_id, result)
-                cache_task_output(task_type, task_id, result)
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                return
-
-            logger.info("Received task - {retryCount}", retryCount=retry_count)
-            publish_status(task_id, "processing", 10, "Starting PDF generation")
-
-            # Only wrap the PDF generation in circuit breaker
-            pdf_response = circuitbreaker.execute(lambda: generate_pdf(task_id, url, trace_id))
-
-            print(pdf_response)
-
-            publish_status(task_id, "completed", 100, "PDF uploaded", fileUrl=pdf_response["url"])
-            cache_task_output(task_type, task_id, {
-                "url": pdf_response["url"]
-            })
-            logger.info("Task completed \n {fileUrl}", fileUrl=pdf_response["url"])
-
-            task_processed_total.labels(type=task_type, status="success").inc()
-
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-
-        except Exception as e:
-            
-            if retry_count >= MAX_RETRIES:
-                logger.error("Max retries reached - {retries} retries", retries=retry_count)
-                publish_status(task_id, "failed", 0, f"Max retries reached ({retry_count})")
-                ## increment DLQ
-                task_dropped_total.labels(type=task_type).inc()
-                # Move to final DLQ
-                ch.basic_publish(
-                    exchange=EXCHANGE_NAME,
-                    routing_key=f"{ROUTING_KEY}.dead",
-                    body=body
-                )
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                
-                return
-        
-            tb = traceback.format_exc()
-            logger.error("Task failed \n {error} \n {traceback}", error=str(e), traceback=tb)
-
-            task_processed_total.labels(type=task_type, status="failed").inc()
-
-            ## increment metrics retry count
-            task_retry_attempts_total.labels(type=task_type).inc()
-
-            publish_status(task_id, "failed", 0, str(e))
-            ch.basic_reject(delivery_tag=method.delivery_tag, requeue=False)
-    
-        duration = time.time() - start_time
-        task_processing_duration_seconds.labels(type=task_type).observe(duration)
-        
-
-def start_worker():
-    tries = 0
-    channel = {}
-
-    while tries < RABBITMQ_CONNECTION_RETRY:
-        try:
-            logger.info(f"[Worker] Connecting to RabbitMQ... attempt {tries + 1}")
-            channel = connect_and_consume()
-            break 
-        except Exception as e:
-            tries += 1
-            logger.warning(f"[Worker] RabbitMQ connection failed: {e}", e)
-
-            if tries >= RABBITMQ_CONNECTION_RETRY:
-                logger.critical("[Worker] Max retry attempts reached. Exiting.")
-                raise Exception("Cannot connect to RabbitMQ") from e
-
-            logger.info(f"[Worker] Retrying in {RETRY_DELAY_SECONDS} seconds...")
-            time.sleep(RETRY_DELAY_SECONDS)
-
-    # Start consuming
-    logger.info("Waiting for messages (with retry/DLQ support)...")
-
-    channel.basic_qos(prefetch_count=1)
-    channel.basic_consume(queue=QUEUE_NAME, on_message_callback=handle_message)
-    
-    channel.start_consuming()
+TASK_TYPE = "generate-pdf"
+
+
+def _output_key(task: GeneratePdfTask) -> str:
+    return f"pdf/{task.id}.pdf"
+
+
+def serve_existing(task: GeneratePdfTask) -> bool:
+    """Publish an earlier result for this task if there is one"""
+    task_id = task.id
+
+    cached = get_cached_output(TASK_TYPE, task_id)
+    if cached:
+        publish_result(task_id, msgspec.structs.replace(cached, cached=True))
+        return True
+
+    s3_key = _output_key(task)
+    if file_exists(os.getenv("S3_BUCKET_NAME"), s3_key):
+        logger.info(f"Skipping task {task_id} — file already in S3")
+        signed_url = generate_signed_url(s3_key)
+        result = TaskStatus(success=True, url=signed_url, cached=True)
+        publish_result(task_id, result)
+        cache_task_output(TASK_TYPE, task_id, result)
+        return True
+
+    return False
+
+
+def _render(task: GeneratePdfTask, s3_key: str) -> TaskStatus:
+    """Serve a current stored render of the same page and options, or render it now"""
+    payload = task.payload
+
+    stored_key = render_cache.lookup(payload.url, payload.pdf_options, payload.max_age)
+    if stored_key:
+        return TaskStatus(success=True, url=generate_signed_url(stored_key))
+
+    # Fetching validators costs a source request; skip it if the renderer would refuse the render anyway
+    get_breaker("renderer").check()
+    # Validators are read before rendering, so a page changing mid-render is caught on the next revalidation
+    read_at = time.time()
+    validators = render_cache.source_validators(payload.url)
+
+    # Only wrap the PDF generation in circuit breaker
+    result = get_breaker("renderer").execute(
+        lambda: generate_pdf(task.id, payload.url, task.trace_id, render_cache.effective_options(payload.pdf_options))
+    )
+    # The renderer wrote the object, so our key index has not seen it yet
+    record_key(s3_key)
+    render_cache.store(payload.url, payload.pdf_options, s3_key, validators, read_at)
+    return result
+
 
+def handle_task(job: Job):
+    task = job.task
+    task_id = task.id
+    s3_key = _output_key(task)
 
+    publish_status(task_id, "processing", 10, "Starting PDF generation")
 
+    # Duplicates in flight elsewhere share one render
+    pdf_response, shared = single_flight(
+        s3_key,
+        lambda: _render(task, s3_key),
+        lambda: get_cached_output(TASK_TYPE, task_id)
+    )
+    if shared:
+        logger.info("Reusing in-flight render result")
 
+    publish_status(task_id, "completed", 100, "PDF uploaded", fileUrl=pdf_response.url)
+    cache_task_output(TASK_TYPE, task_id, TaskStatus(url=pdf_response.url))
+    logger.info("Task completed \n {fileUrl}", fileUrl=pdf_response.url)
@@ -1,20 +1,22 @@
 import uuid
 from pdf_service import generate_pdf
-from redis_publisher import publish_status
-from utils.logger import log
+from taskforge_worker.redis_client import publish_status
+from taskforge_worker.logger import log
+
+logger = log("generate-pdf")
 
 # Simulate a task
 task_id = str(uuid.uuid4())
 url = "https://example.com"
 
-log("info", "Starting local PDF test", taskId=task_id)
+logger.info(f"Starting local PDF test {task_id}")
 publish_status(task_id, "processing", 5, "Starting local test")
 
 try:
-    pdf_path = generate_pdf(task_id, url)
-    publish_status(task_id, "completed", 100, f"PDF created at {pdf_path}")
-    log("success", "PDF generated", path=pdf_path)
+    result = generate_pdf(task_id, url, None)
+    publish_status(task_id, "completed", 100, "PDF created", fileUrl=result.url)
+    logger.info(f"PDF generated at {result.url}")
 
 except Exception as e:
     publish_status(task_id, "failed", 0, str(e))
-    log("error", "Failed to generate PDF", error=str(e))
+    logger.error(f"Failed to generate PDF: {e}")
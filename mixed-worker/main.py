@@ -0,0 +1,41 @@
+# Must come first so STARTUP_PROFILE=true can time every import below
+from taskforge_worker import startup
+startup.enable_import_profiling(("app.",))
+
+import os
+import sys
+import importlib.util
+from dotenv import load_dotenv
+
+# One process for both Python workers: compress-video and generate-pdf share a WORKER_CONCURRENCY pool,
+# split by QUEUE_WEIGHTS / QUEUE_MINIMUMS (see taskforge_worker.multi)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICES = {
+    "compress-video": os.getenv("COMPRESS_VIDEO_DIR", os.path.join(ROOT, "compress-video")),
+    "generate-pdf": os.getenv("GENERATE_PDF_DIR", os.path.join(ROOT, "generate-pdf-worker")),
+}
+
+
+def load_service(task_type: str, path: str):
+    """Import a service's main.py under its own name; both are called main"""
+    sys.path.insert(0, path)
+    spec = importlib.util.spec_from_file_location(f"{task_type.replace('-', '_')}_main", os.path.join(path, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.build_worker(queue=f"task.{task_type}", routing_key=task_type)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    from taskforge_worker.multi import MultiWorker
+
+    enabled = os.getenv("WORKER_TYPES", ",".join(SERVICES)).split(",")
+    worker = MultiWorker([load_service(task_type, SERVICES[task_type]) for task_type in enabled])
+
+    print(f'Starting RabbitMQ worker for {", ".join(enabled)}...')
+    try:
+        worker.run()
+    except Exception as e:
+        print(f'Worker failed to start: {e}')
+        exit(1)
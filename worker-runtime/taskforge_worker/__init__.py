@@ -0,0 +1,7 @@
+"""
+Runtime shared by the TaskForge Python workers: RabbitMQ consume/retry/DLQ
+loop (runner.Worker), status publishing, S3 output, circuit breakers,
+admission control, metrics, health and profiling endpoints.
+
+Submodules are imported explicitly so a worker only pays for what it uses.
+"""
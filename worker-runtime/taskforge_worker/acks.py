@@ -0,0 +1,85 @@
+import os
+
+from .metrics import ack_batch_size
+
+# Successful deliveries acked together with multiple=True
+ACK_BATCH_SIZE = int(os.getenv("ACK_BATCH_SIZE", 10))
+# Longest a finished delivery waits for its batch; unacked messages hold prefetch slots
+ACK_FLUSH_SECONDS = float(os.getenv("ACK_FLUSH_SECONDS", 0.05))
+
+
+class AckBatcher:
+    """
+    Settles the deliveries of one channel. Only ever called on the
+    connection's thread (see Worker._threadsafe), so it needs no locking.
+
+    Successful deliveries are not acked one by one. Once every tag up to
+    some N is settled, a single basic_ack(N, multiple=True) covers all the
+    successes in that window. nack/reject/dead-letter outcomes are sent
+    individually right away; they only ever cover their own tag, so the
+    window can pass over them. Successes stuck behind a still-running
+    delivery are acked individually when the flush timer fires.
+    """
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.outstanding = set()  # delivered, not yet settled
+        self.succeeded = set()    # finished, ack not sent yet
+        self._timer = None
+
+    def delivered(self, tag: int):
+        self.outstanding.add(tag)
+
+    def ack(self, tag: int):
+        self.succeeded.add(tag)
+        if len(self.succeeded) >= ACK_BATCH_SIZE or self.succeeded == self.outstanding:
+            self.flush(final=self.succeeded == self.outstanding)
+        elif self._timer is None:
+            self._timer = self.channel.connection.call_later(ACK_FLUSH_SECONDS, self._on_timer)
+
+    def nack(self, tag: int, requeue: bool):
+        self.channel.basic_nack(delivery_tag=tag, requeue=requeue)
+        self._settled(tag)
+
+    def reject(self, tag: int):
+        self.channel.basic_reject(delivery_tag=tag, requeue=False)
+        self._settled(tag)
+
+    def ack_one(self, tag: int):
+        """Ack immediately, e.g. once a dead-letter copy is confirmed"""
+        self.channel.basic_ack(delivery_tag=tag)
+        self._settled(tag)
+
+    def _settled(self, tag: int):
+        self.outstanding.discard(tag)
+        if self.succeeded and self.succeeded == self.outstanding:
+            self.flush(final=True)
+
+    def _on_timer(self):
+        self._timer = None
+        self.flush(final=True)
+
+    def flush(self, final: bool = False):
+        """Ack the contiguous window of successes; with final, also the ones behind a running delivery"""
+        if self.channel.is_closed or not self.succeeded:
+            return
+
+        pending = self.outstanding - self.succeeded
+        frontier = min(pending) if pending else None
+        window = [tag for tag in self.succeeded if frontier is None or tag < frontier]
+        if window:
+            self.channel.basic_ack(delivery_tag=max(window), multiple=True)
+            ack_batch_size.observe(len(window))
+            self.succeeded.difference_update(window)
+            self.outstanding.difference_update(window)
+
+        if final:
+            for tag in sorted(self.succeeded):
+                self.channel.basic_ack(delivery_tag=tag)
+                ack_batch_size.observe(1)
+            self.outstanding.difference_update(self.succeeded)
+            self.succeeded.clear()
+
+        if self._timer is not None and not self.succeeded:
+            self.channel.connection.remove_timeout(self._timer)
+            self._timer = None
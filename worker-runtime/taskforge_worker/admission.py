@@ -0,0 +1,114 @@
+import os
+import time
+import threading
+
+from .metrics import admission_budget, admission_reserved, admission_budget_utilization, admission_deferred_total, admission_wait_seconds
+
+# How long a job that does not fit may sit unacked before it goes back to the queue
+ADMISSION_WAIT_SECONDS = float(os.getenv("ADMISSION_WAIT_SECONDS", 30))
+# Share of the container memory limit jobs may reserve; the rest is the worker itself
+ADMISSION_MEMORY_FRACTION = float(os.getenv("ADMISSION_MEMORY_FRACTION", 0.75))
+
+
+def _memory_limit() -> int:
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value != "max" and int(value) < 1 << 60:
+            return int(value)
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def _cpu_limit() -> float:
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    return float(os.cpu_count() or 1)
+
+
+def default_budgets(defaults: dict = None) -> dict:
+    """
+    Per-pod budgets: ADMISSION_MEMORY_BYTES / ADMISSION_DISK_BYTES / ADMISSION_CPU
+    when set, else the service's `defaults`, else the cgroup limits (no disk limit).
+    """
+    defaults = defaults or {}
+    return {
+        "memory": int(os.getenv("ADMISSION_MEMORY_BYTES", 0)) or defaults.get("memory") or int(_memory_limit() * ADMISSION_MEMORY_FRACTION),
+        "disk": int(os.getenv("ADMISSION_DISK_BYTES", 0)) or defaults.get("disk") or float("inf"),
+        "cpu": float(os.getenv("ADMISSION_CPU", 0)) or defaults.get("cpu") or _cpu_limit(),
+    }
+
+
+class AdmissionController:
+    """
+    Reserves each job's estimated footprint (anything with a needs() dict of
+    memory/disk bytes and cpu cores) against per-pod budgets.
+
+    A job that does not fit waits (its message stays unacked) until running
+    jobs release enough, or gives up after the timeout so the consumer can
+    return it to the queue. A job larger than a whole budget is still
+    admitted once nothing else is running, so it is never starved.
+    """
+
+    def __init__(self, budgets: dict):
+        self.budgets = budgets
+        self.reserved = {resource: 0 for resource in budgets}
+        self.running = 0
+        self.closed = False
+        self._cond = threading.Condition()
+        for resource, budget in budgets.items():
+            admission_budget.labels(resource=resource).set(budget)
+        self._export()
+
+    def _fits(self, footprint) -> bool:
+        needs = footprint.needs()
+        return all(self.reserved[r] + needs[r] <= self.budgets[r] for r in self.budgets)
+
+    def admit(self, footprint, timeout: float = ADMISSION_WAIT_SECONDS) -> bool:
+        started = time.monotonic()
+        deadline = started + timeout
+        with self._cond:
+            while self.closed or not (self._fits(footprint) or self.running == 0):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self.closed:
+                    admission_deferred_total.labels(outcome="requeued").inc()
+                    return False
+                self._cond.wait(remaining)
+
+            waited = time.monotonic() - started
+            if waited > 0.001:
+                admission_deferred_total.labels(outcome="waited").inc()
+            admission_wait_seconds.observe(waited)
+
+            for resource, need in footprint.needs().items():
+                self.reserved[resource] += need
+            self.running += 1
+            self._export()
+            return True
+
+    def close(self):
+        """Turn away every job still waiting and any that arrives later, e.g. while draining"""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def release(self, footprint):
+        with self._cond:
+            for resource, need in footprint.needs().items():
+                self.reserved[resource] -= need
+            self.running -= 1
+            self._export()
+            self._cond.notify_all()
+
+    def _export(self):
+        for resource, budget in self.budgets.items():
+            admission_reserved.labels(resource=resource).set(self.reserved[resource])
+            admission_budget_utilization.labels(resource=resource).set(self.reserved[resource] / budget if budget else 0)
+
@@ -0,0 +1,102 @@
+import os
+import time
+import threading
+from collections import deque
+
+import pika
+
+from .logger import logger
+from .metrics import task_queue_depth, tasks_in_flight, task_service_time_seconds, backlog_drain_seconds, worker_concurrency
+
+# How often the queue depth is read, on a connection of its own
+BACKLOG_POLL_SECONDS = float(os.getenv("BACKLOG_POLL_SECONDS", 15))
+# Service time is the mean of this many recent tasks
+BACKLOG_WINDOW = int(os.getenv("BACKLOG_WINDOW", 50))
+# Assumed until the first task finishes, so a cold pod still reports a sensible drain time
+BACKLOG_DEFAULT_SERVICE_SECONDS = float(os.getenv("BACKLOG_DEFAULT_SERVICE_SECONDS", 10))
+
+
+class BacklogMonitor:
+    """
+    Autoscaling signal: how long the work waiting for this worker would take.
+
+    backlog_drain_seconds = (ready messages in the task and retry queues
+    + tasks in flight here) * recent mean service time / concurrency,
+    i.e. the time this pod alone would need to clear the backlog. Every
+    pod sees the same queue depth, so the value is comparable across pods
+    and desired replicas ≈ drain seconds / target drain seconds.
+    """
+
+    def __init__(self, task_type: str, url: str, queues, concurrency: int):
+        self.task_type = task_type
+        self.url = url
+        self.queues = list(queues)
+        self.concurrency = concurrency
+        self.depth = {queue: 0 for queue in self.queues}
+        self.in_flight = 0
+        self._durations = deque(maxlen=BACKLOG_WINDOW)
+        self._lock = threading.Lock()
+        self._connection = None
+        worker_concurrency.set(concurrency)
+        task_service_time_seconds.labels(type=task_type).set_function(self.service_time)
+        backlog_drain_seconds.labels(type=task_type).set_function(self.drain_seconds)
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+        tasks_in_flight.labels(type=self.task_type).inc()
+
+    def finished(self):
+        with self._lock:
+            self.in_flight -= 1
+        tasks_in_flight.labels(type=self.task_type).dec()
+
+    def record(self, duration: float):
+        """Service time of one task, excluding time spent queued or waiting for admission"""
+        with self._lock:
+            self._durations.append(duration)
+
+    def service_time(self) -> float:
+        with self._lock:
+            if not self._durations:
+                return BACKLOG_DEFAULT_SERVICE_SECONDS
+            return sum(self._durations) / len(self._durations)
+
+    def drain_seconds(self) -> float:
+        pending = sum(self.depth.values()) + self.in_flight
+        return pending * self.service_time() / max(1, self.concurrency)
+
+    def start(self):
+        threading.Thread(target=self._poll_loop, name="backlog-monitor", daemon=True).start()
+
+    def _poll_loop(self):
+        while True:
+            try:
+                self._poll()
+            except Exception as e:
+                # Keep the last known depth; a stale signal beats a scaler reading zero
+                logger.warning(f"Backlog poll failed: {e!r}")
+                self._close()
+            time.sleep(BACKLOG_POLL_SECONDS)
+
+    def _poll(self):
+        if self._connection is None or self._connection.is_closed:
+            self._connection = pika.BlockingConnection(pika.URLParameters(self.url))
+        channel = self._connection.channel()
+        try:
+            for queue in self.queues:
+                # Passive: only reads the counters, never creates or changes the queue
+                result = channel.queue_declare(queue=queue, passive=True)
+                self.depth[queue] = result.method.message_count
+                task_queue_depth.labels(queue=queue).set(result.method.message_count)
+        finally:
+            if channel.is_open:
+                channel.close()
+
+    def _close(self):
+        try:
+            if self._connection is not None and self._connection.is_open:
+                self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
@@ -0,0 +1,195 @@
+import os
+import time
+import threading
+from collections import deque
+from .logger import logger, format_exception_once
+from .metrics import circuit_breaker_state, circuit_breaker_rejected_total
+
+CB_WINDOW_SECONDS = float(os.getenv("CB_WINDOW_SECONDS", 60))
+CB_MIN_CALLS = int(os.getenv("CB_MIN_CALLS", 5))
+CB_FAILURE_RATE = float(os.getenv("CB_FAILURE_RATE", 0.5))
+CB_OPEN_SECONDS = float(os.getenv("CB_OPEN_SECONDS", 60))
+CB_HALF_OPEN_PROBES = int(os.getenv("CB_HALF_OPEN_PROBES", 1))
+# How long callers back off while a half-open breaker's probe slots are all taken
+CB_PROBE_WAIT_SECONDS = float(os.getenv("CB_PROBE_WAIT_SECONDS", 5))
+
+STATE_VALUES = {"CLOSED": 0, "HALF_OPEN": 1, "OPEN": 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the dependency's breaker is open"""
+
+    def __init__(self, dependency: str, retryAfter: float):
+        super().__init__(f"Circuit breaker for {dependency} is OPEN")
+        self.dependency = dependency
+        self.retryAfter = retryAfter
+
+
+class ConsumerCircuitBreaker:
+    """
+    Sliding-window failure-rate breaker for a single dependency.
+
+    Opens once at least `minCalls` calls were made in the last `windowSeconds`
+    and the failure ratio among them reaches `failureRate`. After `timeout`
+    seconds it lets up to `halfOpenProbes` calls through; that many successes
+    close it again, any failure re-opens it. While those probes run, other
+    calls are refused with a retry-after of `probeWait` seconds.
+    """
+
+    def __init__(self, name: str, windowSeconds: float = CB_WINDOW_SECONDS, minCalls: int = CB_MIN_CALLS,
+                 failureRate: float = CB_FAILURE_RATE, timeout: float = CB_OPEN_SECONDS,
+                 halfOpenProbes: int = CB_HALF_OPEN_PROBES, probeWait: float = CB_PROBE_WAIT_SECONDS):
+        self.name = name
+        self.windowSeconds = windowSeconds
+        self.minCalls = minCalls
+        self.failureRate = failureRate
+        self.timeout = timeout
+        self.halfOpenProbes = halfOpenProbes
+        self.probeWait = probeWait
+
+        self.state = "CLOSED"
+        self.calls = deque()  # (timestamp, succeeded)
+        self.lastFailureTime = 0
+        self.openedAt = 0
+        self.probesInFlight = 0
+        self.probeSuccesses = 0
+        self.listeners = []
+        self.lock = threading.Lock()
+        circuit_breaker_state.labels(dependency=name).set(STATE_VALUES["CLOSED"])
+
+    def execute(self, toExecute):
+        self.acquire()
+        try:
+            result = toExecute()
+        except Exception as e:
+            tb = format_exception_once(e) or "(traceback already logged)"
+            logger.error("{dependency} call failed \n {error} \n {traceback}", dependency=self.name, error=str(e), traceback=tb)
+            self.onFailure()
+            raise
+        self.onSuccess()
+        return result
+
+    def acquire(self):
+        """Reserve a call slot, raising CircuitOpenError if the breaker refuses it"""
+        with self.lock:
+            if self.state == "OPEN":
+                if time.time() - self.openedAt < self.timeout:
+                    circuit_breaker_rejected_total.labels(dependency=self.name).inc()
+                    raise CircuitOpenError(self.name, self.getRetryAfter())
+                self._transition("HALF_OPEN")
+
+            if self.state == "HALF_OPEN":
+                if self.probesInFlight >= self.halfOpenProbes:
+                    circuit_breaker_rejected_total.labels(dependency=self.name).inc()
+                    raise CircuitOpenError(self.name, self.getRetryAfter())
+                self.probesInFlight += 1
+
+    def check(self):
+        """
+        Raise CircuitOpenError if a call made now would be refused, without
+        taking a slot; for work (downloads, probes) only worth doing if the
+        call it leads up to will go through.
+        """
+        with self.lock:
+            wait = self.getRetryAfter()
+        if wait > 0:
+            circuit_breaker_rejected_total.labels(dependency=self.name).inc()
+            raise CircuitOpenError(self.name, wait)
+
+    def onSuccess(self):
+        with self.lock:
+            now = time.time()
+            if self.state == "HALF_OPEN":
+                self.probesInFlight = max(0, self.probesInFlight - 1)
+                self.probeSuccesses += 1
+                if self.probeSuccesses >= self.halfOpenProbes:
+                    self.calls.clear()
+                    self._transition("CLOSED")
+                return
+            self._record(now, True)
+
+    def onFailure(self):
+        with self.lock:
+            now = time.time()
+            self.lastFailureTime = now
+            if self.state == "HALF_OPEN":
+                self.probesInFlight = max(0, self.probesInFlight - 1)
+                self._transition("OPEN")
+                return
+            self._record(now, False)
+            failures = sum(1 for _, ok in self.calls if not ok)
+            if self.state == "CLOSED" and len(self.calls) >= self.minCalls \
+                    and failures / len(self.calls) >= self.failureRate:
+                self._transition("OPEN")
+
+    def _record(self, now, succeeded):
+        self.calls.append((now, succeeded))
+        while self.calls and now - self.calls[0][0] > self.windowSeconds:
+            self.calls.popleft()
+
+    def _transition(self, state):
+        if state == self.state:
+            return
+        previous = self.state
+        self.state = state
+        if state == "OPEN":
+            self.openedAt = time.time()
+        if state != "HALF_OPEN":
+            self.probesInFlight = 0
+        self.probeSuccesses = 0
+        circuit_breaker_state.labels(dependency=self.name).set(STATE_VALUES[state])
+        logger.warning(f"Circuit for {self.name} moved {previous} → {state}")
+        for listener in self.listeners:
+            try:
+                listener(self.name, state)
+            except Exception as e:
+                logger.error(f"Circuit listener failed: {e}")
+
+    def addListener(self, listener):
+        self.listeners.append(listener)
+
+    def isOpen(self):
+        return self.state == "OPEN" and self.getRetryAfter() > 0
+
+    def getRetryAfter(self):
+        """Seconds until the breaker may admit a call: an open one's half-open probe, or a free probe slot"""
+        if self.state == "HALF_OPEN":
+            return self.probeWait if self.probesInFlight >= self.halfOpenProbes else 0
+        if self.state != "OPEN":
+            return 0
+        return max(0, self.timeout - (time.time() - self.openedAt))
+
+    def getState(self):
+        failures = sum(1 for _, ok in self.calls if not ok)
+        return {
+                    "state": self.state,
+                    "failureCount": failures,
+                    "calls": len(self.calls),
+                    "failureRate": failures / len(self.calls) if self.calls else 0,
+                    "threshold": self.failureRate,
+                    "timeSinceLastFailure": self.getTimeSinceLastFailure()
+                }
+
+    def getTimeSinceLastFailure(self):
+        return time.time() - self.lastFailureTime if self.lastFailureTime > 0 else 0
+
+
+breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name: str) -> ConsumerCircuitBreaker:
+    """Breaker for a dependency, created on first use; services register theirs up front via Worker(dependencies=...)"""
+    breaker = breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = breakers.get(name)
+            if breaker is None:
+                breaker = breakers[name] = ConsumerCircuitBreaker(name)
+    return breaker
+
+def open_retry_after(names=None) -> float:
+    """
+    Longest wait among breakers refusing calls, open or half-open with every
+    probe slot taken (only those in `names`, if given); 0 when all admit calls
+    """
+    return max((b.getRetryAfter() for name, b in breakers.items() if names is None or name in names), default=0)
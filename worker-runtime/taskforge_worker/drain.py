@@ -0,0 +1,97 @@
+import os
+import time
+import signal
+import threading
+
+from .logger import logger, flush_logs
+from .metrics import worker_draining, drain_tasks_total
+
+# How long in-flight tasks may keep running after SIGTERM; keep it under the pod's terminationGracePeriodSeconds
+DRAIN_DEADLINE_SECONDS = float(os.getenv("DRAIN_DEADLINE_SECONDS", 25))
+
+_requested = threading.Event()
+
+
+def install():
+    """Drain on SIGTERM instead of dying mid-task; only the main thread may set signal handlers"""
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _on_sigterm)
+
+
+def _on_sigterm(signum, frame):
+    # Runs between two bytecodes of the main thread, possibly inside pika, a logger or a metric
+    # holding its lock: only set the flag, the consume loop notices it within a second
+    _requested.set()
+
+
+def requested() -> bool:
+    """True once a drain was asked for; /health reports the pod not ready from then on"""
+    return _requested.is_set()
+
+
+def begin(in_flight: int):
+    worker_draining.set(1)
+    logger.warning(f"🛑 SIGTERM received: consumption stopped, {in_flight} delivery(ies) held, in-flight tasks get {DRAIN_DEADLINE_SECONDS:.0f}s")
+
+
+def sleep(connection, seconds: float):
+    """connection.sleep, cut short by a drain request"""
+    deadline = time.monotonic() + seconds
+    while not requested():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        connection.sleep(min(1.0, remaining))
+
+
+def hand_back_unstarted(acks, tags) -> int:
+    """Requeue deliveries that never started; no retry is spent, so another pod takes them as they are"""
+    count = 0
+    for tag in tags:
+        acks.nack(tag, requeue=True)
+        count += 1
+    drain_tasks_total.labels(outcome="unstarted").inc(count)
+    return count
+
+
+def settle_in_flight(connection, batchers, started_with: int) -> int:
+    """
+    Keep the connection running until every delivery on `batchers` is
+    settled or DRAIN_DEADLINE_SECONDS pass, then requeue what is left.
+    Returns the number of tasks handed back still running.
+    """
+    deadline = time.monotonic() + DRAIN_DEADLINE_SECONDS
+    running = lambda: sum(len(acks.outstanding - acks.succeeded) for acks in batchers if not acks.channel.is_closed)
+    while running() and time.monotonic() < deadline:
+        connection.process_data_events(time_limit=1)
+
+    handed_back = 0
+    for acks in batchers:
+        if acks.channel.is_closed:
+            continue
+        acks.flush(final=True)
+        for tag in sorted(acks.outstanding):
+            acks.nack(tag, requeue=True)
+            handed_back += 1
+    drain_tasks_total.labels(outcome="finished").inc(max(0, started_with - handed_back))
+    drain_tasks_total.labels(outcome="handed_back").inc(handed_back)
+    if handed_back:
+        logger.warning(f"⏱️ Drain deadline of {DRAIN_DEADLINE_SECONDS:.0f}s passed, {handed_back} running task(s) requeued")
+    return handed_back
+
+
+def finish(still_running: int):
+    """
+    Exit once drained. Tasks whose deliveries went back to the queue may
+    still be running on pool threads, which the interpreter would wait for
+    at exit, so the process leaves without them after releasing their
+    single-flight leases.
+    """
+    if not still_running:
+        logger.info("✅ Drained, no task left running")
+        return
+    from .single_flight import abandon_leases
+    abandon_leases()
+    logger.warning(f"🛑 Exiting with {still_running} task(s) still running; their deliveries are back on the queue")
+    flush_logs()
+    os._exit(0)
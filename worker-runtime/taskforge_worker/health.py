@@ -1,10 +1,11 @@
-from .logger import log
-from app.redis_client import isRedisHealthy
-from app.consumer import isRabbitMQHealthy
-
-logger = log(service="compress-video")
+from .logger import logger
 
 def check_services_health():
+    # Imported here so the metrics server does not pull the consumer import graph in with it
+    from .redis_client import isRedisHealthy
+    from .runner import isRabbitMQHealthy
+    from .drain import requested as draining
+
     health_status = {
         "status": "Healthy",
         "services": {
@@ -13,6 +14,10 @@ def check_services_health():
         }
     }
 
+    if draining():
+        # Not ready from the moment SIGTERM arrives; /live stays up so the drain is not cut short
+        health_status["status"] = "Draining"
+
     if not isRabbitMQHealthy():
         logger.info("rabbitmq is not healthy")
         health_status["status"] = "Unhealthy"
@@ -22,8 +27,7 @@ def check_services_health():
         logger.info("redis is not healthy")
         health_status["status"] = "Unhealthy"
         health_status["services"]["redis"] = "DOWN"
-     
-    print(health_status)
+
     return health_status
 
 
@@ -0,0 +1,70 @@
+import os
+import time
+from datetime import datetime, timezone
+
+from .logger import logger
+from .metrics import (task_queue_wait_seconds, task_retry_delay_seconds, task_end_to_end_seconds,
+                      task_latency_slo_seconds, task_slo_objective, task_slo_events_total, task_slo_breaches_total)
+
+# A finished task is "good" when it completed within this many seconds of createdAt
+TASK_LATENCY_SLO_SECONDS = float(os.getenv("TASK_LATENCY_SLO_SECONDS", 300))
+TASK_SLO_OBJECTIVE = float(os.getenv("TASK_SLO_OBJECTIVE", 0.99))
+
+
+def export_slo(task_type: str):
+    task_latency_slo_seconds.labels(type=task_type).set(TASK_LATENCY_SLO_SECONDS)
+    task_slo_objective.labels(type=task_type).set(TASK_SLO_OBJECTIVE)
+
+
+def created_at(task):
+    """createdAt as epoch seconds, or None when missing or unparseable"""
+    value = getattr(task, "created_at", None)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        logger.debug(f"Unparseable createdAt {value!r}")
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def requeued_at(properties, queue: str):
+    """When the delivery last expired out of <queue>.retry back onto the task queue, from x-death"""
+    if not properties or not properties.headers:
+        return None
+    for death in properties.headers.get("x-death", []):
+        if isinstance(death, dict) and death.get("queue") == f"{queue}.retry":
+            stamp = death.get("time")
+            if isinstance(stamp, datetime):
+                # pika decodes AMQP timestamps as naive UTC datetimes
+                return stamp.replace(tzinfo=timezone.utc).timestamp() if stamp.tzinfo is None else stamp.timestamp()
+            if isinstance(stamp, (int, float)):
+                return float(stamp)
+    return None
+
+
+def observe_pickup(task_type: str, task, properties, queue: str, retry_count: int):
+    """Queue wait of this delivery and, for retries, the time already lost to earlier attempts"""
+    now = time.time()
+    created = created_at(task)
+    enqueued = requeued_at(properties, queue) if retry_count else created
+    if enqueued is not None:
+        # Clamped: createdAt comes from another host's clock
+        task_queue_wait_seconds.labels(type=task_type).observe(max(0.0, now - enqueued))
+    if retry_count and created is not None and enqueued is not None:
+        task_retry_delay_seconds.labels(type=task_type).observe(max(0.0, enqueued - created))
+
+
+def observe_finished(task_type: str, task, outcome: str):
+    """End-to-end latency and SLO accounting for a task that completed or was dead-lettered"""
+    created = created_at(task)
+    if created is None:
+        return
+    elapsed = max(0.0, time.time() - created)
+    task_end_to_end_seconds.labels(type=task_type, outcome=outcome).observe(elapsed)
+    task_slo_events_total.labels(type=task_type).inc()
+    if outcome != "completed" or elapsed > TASK_LATENCY_SLO_SECONDS:
+        task_slo_breaches_total.labels(type=task_type).inc()
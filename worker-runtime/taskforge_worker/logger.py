@@ -0,0 +1,178 @@
+from loguru import logger
+import os
+import sys
+import time
+import queue
+import atexit
+import itertools
+import threading
+import traceback
+
+import msgspec
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Serialize and write on a background thread instead of the consume loop
+LOG_ASYNC = os.getenv("LOG_ASYNC", "false").lower() == "true"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+# "<event>=<N>,...": keep 1 in N INFO/DEBUG records bound with that event type; off unless set
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+# Log a given error signature's traceback at most once per window
+LOG_TRACEBACK_WINDOW = float(os.getenv("LOG_TRACEBACK_WINDOW", 300))
+
+
+def _parse_rates(spec: str) -> dict:
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        event, _, rate = item.partition("=")
+        rates[event.strip()] = max(1, int(rate or 1))
+    return rates
+
+_sample_rates = _parse_rates(LOG_SAMPLE_RATES)
+_sample_counters = {event: itertools.count() for event in _sample_rates}
+
+def _sample(record) -> bool:
+    """Runs on the caller's thread before any formatting, so dropped records cost almost nothing"""
+    event = record["extra"].get("event")
+    if event not in _sample_counters or record["level"].no >= 30:
+        return True
+    return next(_sample_counters[event]) % _sample_rates[event] == 0
+
+
+class _QueueSink:
+    """
+    Non-blocking sink: the caller only enqueues the record; JSON serialization
+    and the stdout write happen on a daemon thread. When the queue is full the
+    record is dropped rather than stalling the worker.
+    """
+
+    def __init__(self, stream, maxsize: int):
+        self._stream = stream
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._encoder = msgspec.json.Encoder(enc_hook=str)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._drain, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def write(self, message):
+        try:
+            self._queue.put_nowait(message.record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self):
+        while True:
+            records = [self._queue.get()]
+            # Batch whatever else is already waiting into a single write
+            while len(records) < 512:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._stream.write("".join(self._serialize(r) for r in records))
+                self._stream.flush()
+            except Exception:
+                pass
+            for _ in records:
+                self._queue.task_done()
+
+    def _serialize(self, record) -> str:
+        text = f"{record['time']:YYYY-MM-DD HH:mm:ss.SSS} | {record['level'].name:<8} | {record['name']}:{record['function']}:{record['line']} - {record['message']}\n"
+        exception = record["exception"]
+        if exception is not None:
+            text += "".join(traceback.format_exception(exception.type, exception.value, exception.traceback))
+        # Same shape as loguru's serialize=True so log queries keep working
+        return self._encoder.encode({
+            "text": text,
+            "record": {
+                "elapsed": {"repr": str(record["elapsed"]), "seconds": record["elapsed"].total_seconds()},
+                "exception": None if exception is None else {
+                    "type": exception.type.__name__ if exception.type else None,
+                    "value": str(exception.value),
+                    "traceback": exception.traceback is not None,
+                },
+                "extra": record["extra"],
+                "file": {"name": record["file"].name, "path": record["file"].path},
+                "function": record["function"],
+                "level": {"icon": record["level"].icon, "name": record["level"].name, "no": record["level"].no},
+                "line": record["line"],
+                "message": record["message"],
+                "module": record["module"],
+                "name": record["name"],
+                "process": {"id": record["process"].id, "name": record["process"].name},
+                "thread": {"id": record["thread"].id, "name": record["thread"].name},
+                "time": {"repr": str(record["time"]), "timestamp": record["time"].timestamp()},
+            },
+        }).decode() + "\n"
+
+    def flush(self, timeout: float = 2.0):
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+logger.remove()
+_queue_sink = None
+if LOG_ASYNC:
+    _queue_sink = _QueueSink(sys.stdout, LOG_QUEUE_SIZE)
+    logger.add(
+        _queue_sink,
+        format="{message}",
+        filter=_sample,
+        level=LOG_LEVEL
+    )
+else:
+    logger.add(
+        sys.stdout,
+        serialize=True,
+        filter=_sample,
+        level=LOG_LEVEL
+    )
+
+# Records from the shared runtime carry the service they run in
+_service = os.getenv("SERVICE_NAME", "worker")
+logger.configure(extra={"service": _service})
+
+def set_service(service: str):
+    """Name the service every unbound record is attributed to"""
+    global _service
+    _service = service
+    logger.configure(extra={"service": service})
+
+def service_name() -> str:
+    return _service
+
+def flush_logs():
+    """Write out queued records, for exits that skip atexit"""
+    if _queue_sink is not None:
+        _queue_sink.flush()
+
+def log(service: str):
+    return logger.bind(service=service)
+
+
+_traceback_seen = {}
+_traceback_lock = threading.Lock()
+
+def format_exception_once(exc: BaseException):
+    """
+    Full traceback for `exc` the first time its signature (type + raising
+    frame) is seen within LOG_TRACEBACK_WINDOW, otherwise None.
+    """
+    frames = traceback.extract_tb(exc.__traceback__)
+    origin = frames[-1] if frames else None
+    signature = (type(exc).__name__, origin.filename if origin else "", origin.lineno if origin else 0)
+
+    now = time.monotonic()
+    with _traceback_lock:
+        last_seen = _traceback_seen.get(signature)
+        if last_seen is not None and now - last_seen < LOG_TRACEBACK_WINDOW:
+            return None
+        _traceback_seen[signature] = now
+        if len(_traceback_seen) > 1000:
+            for key, seen in list(_traceback_seen.items()):
+                if now - seen >= LOG_TRACEBACK_WINDOW:
+                    del _traceback_seen[key]
+
+    return "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
@@ -0,0 +1,77 @@
+from prometheus_client import (
+    Counter, 
+    generate_latest, 
+    CONTENT_TYPE_LATEST, 
+    CollectorRegistry, 
+    platform_collector,
+    process_collector,
+    gc_collector,
+    Gauge,
+    Histogram)
+
+import os
+
+def _buckets(spec: str):
+    return tuple(float(b) for b in spec.split(",") if b.strip())
+
+# Task latency buckets (seconds), set per workload: a PDF worker cares about seconds, video about minutes
+TASK_LATENCY_BUCKETS = _buckets(os.getenv("TASK_LATENCY_BUCKETS", "0.5,1,2.5,5,10,30,60,120,300,600,1200,1800,3600"))
+
+registry = CollectorRegistry()
+gc_collector.GCCollector(registry=registry)
+platform_collector.PlatformCollector(registry=registry)
+process_collector.ProcessCollector(registry=registry)
+
+task_processed_total = Counter("task_processed_total", "Total number of task processed", ["type", "status"], registry=registry)
+task_retry_attempts_total = Counter("task_retry_attempts_total", "Total number of retry attempts", ["type"], registry=registry)
+task_dropped_total = Counter('task_dropped_total', "Tasks dropped to DLQ", ["type"], registry=registry)
+task_processing_duration_seconds = Histogram("task_processing_duration_seconds", "Time spent on task", ["type"], buckets=TASK_LATENCY_BUCKETS, registry=registry)
+s3_upload_failures_total = Counter("s3_upload_failures_total", "Failures while pushing output to S3", ["type"], registry=registry)
+
+circuit_breaker_state = Gauge("circuit_breaker_state", "Dependency circuit state (0=closed, 1=half-open, 2=open)", ["dependency"], registry=registry)
+circuit_breaker_rejected_total = Counter("circuit_breaker_rejected_total", "Calls refused by an open circuit", ["dependency"], registry=registry)
+consumer_paused = Gauge("consumer_paused", "1 while consumption is paused by an open circuit", ["queue"], registry=registry)
+single_flight_total = Counter("single_flight_total", "Single-flight lease outcomes per task", ["outcome"], registry=registry)
+worker_startup_seconds = Gauge("worker_startup_seconds", "Seconds from process start until the consumer was subscribed", registry=registry)
+worker_time_to_first_message_seconds = Gauge("worker_time_to_first_message_seconds", "Seconds from process start until the first message arrived", registry=registry)
+task_malformed_total = Counter("task_malformed_total", "Malformed tasks sent straight to the DLQ", ["type"], registry=registry)
+status_stream_appends_total = Counter("status_stream_appends_total", "Status updates appended to Redis Streams", registry=registry)
+status_stream_batch_size = Histogram("status_stream_batch_size", "Status updates per pipelined XADD batch", buckets=(1, 2, 5, 10, 25, 50, 100), registry=registry)
+s3_key_index_lookups_total = Counter("s3_key_index_lookups_total", "Output-key existence lookups; recent/absent results skipped a HEAD, shared ones went to a HEAD because another pod may have written the key since the listing", ["prefix", "result"], registry=registry)
+s3_key_index_false_positives_total = Counter("s3_key_index_false_positives_total", "Bloom possible-positives that HEAD reported missing", ["prefix"], registry=registry)
+s3_key_index_keys = Gauge("s3_key_index_keys", "Keys loaded into the S3 key index at the last refresh", ["prefix"], registry=registry)
+admission_budget = Gauge("admission_budget", "Per-pod budget jobs are admitted against (bytes or cores)", ["resource"], registry=registry)
+admission_reserved = Gauge("admission_reserved", "Budget reserved by admitted jobs (bytes or cores)", ["resource"], registry=registry)
+admission_budget_utilization = Gauge("admission_budget_utilization", "Reserved share of the per-pod budget", ["resource"], registry=registry)
+admission_deferred_total = Counter("admission_deferred_total", "Jobs that did not fit on arrival; waited = admitted later, requeued = returned to the queue", ["outcome"], registry=registry)
+admission_wait_seconds = Histogram("admission_wait_seconds", "Time a job waited for budget before starting", buckets=[0.01, 0.1, 0.5, 1, 5, 10, 30, 60], registry=registry)
+profiles_captured_total = Counter("profiles_captured_total", "Profiles captured through the debug endpoints or PROFILE_EVERY_N_TASKS", ["mode"], registry=registry)
+rabbitmq_reconnects_total = Counter("rabbitmq_reconnects_total", "In-process reconnects after the RabbitMQ connection or channel was lost", registry=registry)
+ack_batch_size = Histogram("ack_batch_size", "Deliveries settled per basic_ack", buckets=(1, 2, 5, 10, 20, 50), registry=registry)
+dlq_publish_failures_total = Counter("dlq_publish_failures_total", "Dead-letter publishes the broker nacked or could not route; the original was requeued", registry=registry)
+task_queue_wait_seconds = Histogram("task_queue_wait_seconds", "Time a delivery sat in the task queue: since createdAt, or since it left the retry queue", ["type"], buckets=TASK_LATENCY_BUCKETS, registry=registry)
+task_retry_delay_seconds = Histogram("task_retry_delay_seconds", "Time lost to earlier attempts: createdAt until the retried delivery was queued again", ["type"], buckets=TASK_LATENCY_BUCKETS, registry=registry)
+task_end_to_end_seconds = Histogram("task_end_to_end_seconds", "createdAt until the task completed or was dead-lettered", ["type", "outcome"], buckets=TASK_LATENCY_BUCKETS, registry=registry)
+task_latency_slo_seconds = Gauge("task_latency_slo_seconds", "End-to-end latency a task must finish within to count as good", ["type"], registry=registry)
+task_slo_objective = Gauge("task_slo_objective", "Target share of good tasks; 1 - objective is the error budget", ["type"], registry=registry)
+task_slo_events_total = Counter("task_slo_events_total", "Tasks that finished (completed or dead-lettered), the SLO denominator", ["type"], registry=registry)
+task_slo_breaches_total = Counter("task_slo_breaches_total", "Finished tasks that were dead-lettered or slower than task_latency_slo_seconds", ["type"], registry=registry)
+task_queue_depth = Gauge("task_queue_depth", "Ready messages in a task or retry queue, from a periodic passive declare", ["queue"], registry=registry)
+tasks_in_flight = Gauge("tasks_in_flight", "Tasks this worker has received and not yet settled", ["type"], registry=registry)
+task_service_time_seconds = Gauge("task_service_time_seconds", "Mean handler time of recent tasks", ["type"], registry=registry)
+backlog_drain_seconds = Gauge("backlog_drain_seconds", "Seconds this pod alone would need to work off queued and in-flight tasks; the autoscaling signal", ["type"], registry=registry)
+worker_concurrency = Gauge("worker_concurrency", "Tasks this worker processes at once (WORKER_CONCURRENCY)", registry=registry)
+queue_weight = Gauge("queue_weight", "Scheduling weight of a queue in a multi-queue worker", ["queue"], registry=registry)
+queue_slots_in_use = Gauge("queue_slots_in_use", "Shared worker slots running tasks from a queue", ["queue"], registry=registry)
+queue_tasks_waiting = Gauge("queue_tasks_waiting", "Prefetched deliveries from a queue waiting for a worker slot", ["queue"], registry=registry)
+queue_prefetch = Gauge("queue_prefetch", "Current prefetch of a queue's consumer in a multi-queue worker", ["queue"], registry=registry)
+# Per-task resource accounting (see usage.py); format is the service's output format label
+_BYTES_BUCKETS = (1e5, 1e6, 1e7, 5e7, 1e8, 2.5e8, 5e8, 1e9, 2.5e9, 5e9, 1e10)
+task_child_cpu_seconds = Histogram("task_child_cpu_seconds", "CPU time (user + system) of the child processes a task ran, e.g. ffmpeg", ["type", "format"], buckets=(0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1200, 3600, 7200), registry=registry)
+task_child_max_rss_bytes = Histogram("task_child_max_rss_bytes", "Peak resident memory of a task's largest child process", ["type", "format"], buckets=(1.6e7, 3.2e7, 6.4e7, 1.28e8, 2.56e8, 5.12e8, 1.024e9, 2.048e9, 4.096e9, 8.192e9), registry=registry)
+task_child_io_bytes = Histogram("task_child_io_bytes", "Bytes a task's child processes read from or wrote to storage (block I/O, so page-cache hits are not counted)", ["type", "format", "direction"], buckets=_BYTES_BUCKETS, registry=registry)
+task_transfer_bytes = Histogram("task_transfer_bytes", "Bytes a task downloaded (inputs) or uploaded (outputs)", ["type", "format", "direction"], buckets=_BYTES_BUCKETS, registry=registry)
+task_python_cpu_seconds = Histogram("task_python_cpu_seconds", "CPU time of the Python threads that worked on a task", ["type", "format"], buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60), registry=registry)
+task_python_alloc_peak_bytes = Histogram("task_python_alloc_peak_bytes", "Peak traced Python allocation during a task (USAGE_TRACE_ALLOCATIONS only)", ["type", "format"], buckets=(1e5, 1e6, 5e6, 1e7, 5e7, 1e8, 2.5e8, 5e8, 1e9), registry=registry)
+worker_draining = Gauge("worker_draining", "1 once SIGTERM was received and the worker is draining", registry=registry)
+drain_tasks_total = Counter("drain_tasks_total", "Deliveries held when a drain began: unstarted = handed back at once, finished = completed before the deadline, handed_back = requeued at the deadline", ["outcome"], registry=registry)
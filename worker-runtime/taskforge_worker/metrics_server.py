@@ -0,0 +1,99 @@
+import hmac
+import math
+from flask import Flask, request, abort, send_file
+from dotenv import load_dotenv
+from .metrics import generate_latest, CONTENT_TYPE_LATEST, registry
+from .health import check_services_health, live_test
+from . import profiler
+
+load_dotenv()
+
+app = Flask(__name__)
+
+@app.route("/metrics")
+def metrics():
+    return generate_latest(registry), 200, {"Content-Type": CONTENT_TYPE_LATEST}
+
+@app.route("/health")
+def health():
+    health = check_services_health()
+    code = 200 if health["status"] == "Healthy" else 500
+    return health, code, {"Content-Type": "application/json"}
+
+@app.route("/live")
+def live():
+    return live_test(), 200, {"Content-Type": "application/json"}
+
+@app.route('/')
+def hello():
+    return 'Hello world!'
+
+def _authorized() -> bool:
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    return bool(profiler.PROFILING_TOKEN) and hmac.compare_digest(token, profiler.PROFILING_TOKEN)
+
+def _positive(name: str, default, cast=float):
+    """A positive number from the query string; anything else is a 400 rather than a 500"""
+    raw = request.args.get(name)
+    if raw is None:
+        return default
+    try:
+        value = cast(raw)
+    except ValueError:
+        abort(400, description=f"{name} must be a number")
+    if not math.isfinite(value) or value <= 0:
+        abort(400, description=f"{name} must be positive")
+    return value
+
+def _seconds(default: float) -> float:
+    return min(_positive("seconds", default), profiler.MAX_PROFILE_SECONDS)
+
+@app.route("/debug/profile/cpu")
+def profile_cpu():
+    """Sampled stacks of all threads for ?seconds=N, collapsed format"""
+    if not _authorized():
+        abort(404)
+    return profiler.sample_stacks(_seconds(10)), 200, {"Content-Type": "text/plain"}
+
+@app.route("/debug/profile/tasks", methods=["GET", "POST"])
+def profile_tasks():
+    """POST ?count=N profiles the next N tasks; GET returns them (?format=text|pstats) once done"""
+    if not _authorized():
+        abort(404)
+    if request.method == "POST":
+        count = _positive("count", 1, int)
+        profiler.task_profiles.arm(count)
+        return {"armed": count}, 202
+    remaining, stats = profiler.task_profiles.result()
+    if remaining or stats is None:
+        return {"remaining": remaining}, 202
+    body, content_type = profiler.render_stats(stats, request.args.get("format", "text"))
+    return body, 200, {"Content-Type": content_type}
+
+@app.route("/debug/profile/memory")
+def profile_memory():
+    """tracemalloc diff over ?seconds=N, ?top=K lines"""
+    if not _authorized():
+        abort(404)
+    return profiler.memory_diff(_seconds(30), _positive("top", 30, int)), 200, {"Content-Type": "text/plain"}
+
+@app.route("/debug/profile/saved")
+@app.route("/debug/profile/saved/<name>")
+def profile_saved(name=None):
+    """Profiles written by PROFILE_EVERY_N_TASKS: list, or download one as pstats"""
+    if not _authorized():
+        abort(404)
+    if name is None:
+        return {"profiles": profiler.saved_profiles()}
+    path = profiler.saved_profile_path(name)
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype="application/octet-stream", as_attachment=True)
+
+
+def run_metrics_server(port: int):
+    print(f'Starting metrics server on port {port}')
+    try:
+        app.run(host='0.0.0.0', port=port, debug=False)
+    except Exception as e:
+        print(f'Metrics server failed to start: {e}')
@@ -0,0 +1,327 @@
+import os
+import math
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import msgspec
+import pika
+
+from . import runner, startup, drain
+from .acks import AckBatcher
+from .logger import logger, set_service
+from .circuit_breaker import open_retry_after
+from .metrics import consumer_paused, rabbitmq_reconnects_total, queue_slots_in_use, queue_tasks_waiting, queue_prefetch, queue_weight
+
+# "queue=weight,..." share of the pool each queue gets while several have work (default 1 each)
+QUEUE_WEIGHTS = os.getenv("QUEUE_WEIGHTS", "")
+# "queue=slots,..." slots held back for a queue even while it is idle, so it never waits behind the others' long tasks
+QUEUE_MINIMUMS = os.getenv("QUEUE_MINIMUMS", "")
+# How often per-queue prefetch is recomputed from which queues have work
+PREFETCH_REBALANCE_SECONDS = float(os.getenv("PREFETCH_REBALANCE_SECONDS", 15))
+# Deliveries a queue may hold beyond its slot share, so a freed slot does not wait on a broker round trip
+PREFETCH_LOOKAHEAD = int(os.getenv("PREFETCH_LOOKAHEAD", 1))
+
+
+def parse_shares(text: str, cast=float) -> dict:
+    """'task.compress-video=3,task.generate-pdf=1' -> {queue: value}"""
+    shares = {}
+    for entry in filter(None, (part.strip() for part in text.split(","))):
+        queue, _, value = entry.partition("=")
+        shares[queue.strip()] = cast(value)
+    return shares
+
+
+class _Envelope(msgspec.Struct):
+    type: str = ""
+
+
+_decode_envelope = msgspec.json.Decoder(_Envelope)
+
+
+def task_type_of(body: bytes) -> str:
+    try:
+        return _decode_envelope.decode(body).type
+    except msgspec.DecodeError:
+        return ""
+
+
+class FairScheduler:
+    """
+    Shares `slots` task slots between queues.
+
+    A queue below its minimum always gets the next free slot it has work
+    for, and those minimum slots are held back from the other queues even
+    while it is idle. The remaining slots go by stride scheduling: each
+    start advances the queue's pass by 1/weight and the queue with the
+    lowest pass goes next, so busy queues split the pool in proportion to
+    their weights and a lone busy queue gets all of it.
+    """
+
+    def __init__(self, slots: int, weights: dict, minimums: dict, start):
+        if sum(minimums.values()) > slots:
+            raise ValueError(f"Queue minimums {minimums} exceed the {slots} available slots")
+        self.slots = slots
+        self.weights = weights
+        self.minimums = minimums
+        self.start = start
+        self.waiting = {queue: deque() for queue in weights}
+        self.running = {queue: 0 for queue in weights}
+        self.passes = {queue: 0.0 for queue in weights}
+        self.lock = threading.Lock()
+        for queue in weights:
+            queue_weight.labels(queue=queue).set(weights[queue])
+            queue_slots_in_use.labels(queue=queue).set_function(lambda queue=queue: self.running[queue])
+            queue_tasks_waiting.labels(queue=queue).set_function(lambda queue=queue: len(self.waiting[queue]))
+
+    def submit(self, queue: str, item):
+        with self.lock:
+            if not self.waiting[queue] and not self.running[queue]:
+                # Coming back from idle: no credit for the time it had nothing to do
+                busy = [self.passes[q] for q in self.passes if q != queue and (self.waiting[q] or self.running[q])]
+                self.passes[queue] = max(self.passes[queue], min(busy, default=self.passes[queue]))
+            self.waiting[queue].append(item)
+            started = self._dispatch()
+        for queue, item in started:
+            self.start(queue, item)
+
+    def done(self, queue: str):
+        with self.lock:
+            self.running[queue] -= 1
+            started = self._dispatch()
+        for queue, item in started:
+            self.start(queue, item)
+
+    def drop(self, stale):
+        """Forget waiting items for which stale(item) is true, e.g. deliveries on a channel lost in a reconnect"""
+        with self.lock:
+            for queue in self.waiting:
+                self.waiting[queue] = deque(item for item in self.waiting[queue] if not stale(item))
+
+    def take_waiting(self) -> list:
+        """Remove and return every waiting (queue, item), e.g. to hand them back when draining"""
+        with self.lock:
+            taken = [(queue, item) for queue in self.waiting for item in self.waiting[queue]]
+            for queue in self.waiting:
+                self.waiting[queue].clear()
+        return taken
+
+    def active(self) -> set:
+        with self.lock:
+            return {q for q in self.waiting if self.waiting[q] or self.running[q]}
+
+    def _held_back(self, queue: str) -> int:
+        return sum(max(0, self.minimums.get(q, 0) - self.running[q]) for q in self.running if q != queue)
+
+    def _dispatch(self):
+        started = []
+        while True:
+            free = self.slots - sum(self.running.values())
+            candidates = [q for q in self.waiting if self.waiting[q] and free - 1 >= self._held_back(q)]
+            if not candidates:
+                return started
+            below = [q for q in candidates if self.running[q] < self.minimums.get(q, 0)]
+            if below:
+                queue = min(below, key=lambda q: self.running[q] / self.minimums[q])
+            else:
+                queue = min(candidates, key=lambda q: self.passes[q])
+            self.passes[queue] += 1.0 / self.weights[queue]
+            self.running[queue] += 1
+            started.append((queue, self.waiting[queue].popleft()))
+
+    def prefetch(self, active: set) -> dict:
+        """Per-queue prefetch: minimum plus a weighted share of the spare slots among queues with work"""
+        spare = self.slots - sum(self.minimums.values())
+        busy = active or set(self.weights)
+        total = sum(self.weights[q] for q in busy)
+        targets = {}
+        for queue, weight in self.weights.items():
+            share = math.ceil(spare * weight / total) if queue in busy else 0
+            targets[queue] = max(1, self.minimums.get(queue, 0) + share) + PREFETCH_LOOKAHEAD
+        return targets
+
+
+class _Consumer:
+    __slots__ = ("route", "channel", "acks", "tag", "prefetch")
+
+    def __init__(self, route, channel, acks):
+        self.route = route
+        self.channel = channel
+        self.acks = acks
+        self.tag = None
+        self.prefetch = 0
+
+    @property
+    def consuming(self) -> bool:
+        return self.tag is not None and self.tag in self.channel.consumer_tags
+
+
+class MultiWorker:
+    """
+    Several Workers in one process, consuming all their queues and sharing
+    one pool of WORKER_CONCURRENCY slots through a FairScheduler.
+
+    Each queue has its own channel, AckBatcher and prefetch; every
+    PREFETCH_REBALANCE_SECONDS the prefetch follows the weighted share of
+    the queues that currently have work, so one busy queue can use the
+    whole pool while the others are empty. A delivery is handled by the
+    worker registered for its `type`, falling back to the queue's own
+    worker, while retries and dead letters follow the queue it came from.
+    On SIGTERM it drains like a single Worker: deliveries still waiting for
+    a slot are requeued at once.
+    """
+
+    def __init__(self, workers, weights: dict = None, minimums: dict = None, service: str = None):
+        self.workers = list(workers)
+        self.by_type = {worker.task_type: worker for worker in self.workers}
+        self.by_queue = {worker.route.queue: worker for worker in self.workers}
+        self.service = service or "+".join(worker.service for worker in self.workers)
+        self.metrics_port = self.workers[0].metrics_port
+
+        weights = {**{queue: 1.0 for queue in self.by_queue}, **parse_shares(QUEUE_WEIGHTS), **(weights or {})}
+        minimums = {**parse_shares(QUEUE_MINIMUMS, int), **(minimums or {})}
+        unknown = (set(weights) | set(minimums)) - set(self.by_queue)
+        if unknown:
+            raise ValueError(f"Weights or minimums given for queues no worker consumes: {sorted(unknown)}")
+        self.scheduler = FairScheduler(runner.WORKER_CONCURRENCY, weights, minimums, self._start)
+        self.executor = ThreadPoolExecutor(max_workers=runner.WORKER_CONCURRENCY, thread_name_prefix="task")
+        self.consumers = {}
+        set_service(self.service)
+
+    def _on_message(self, consumer: _Consumer):
+        def on_message(ch, method, properties, body):
+            startup.mark_first_message()
+            consumer.acks.delivered(method.delivery_tag)
+            self.scheduler.submit(consumer.route.queue, (consumer, method, properties, body))
+        return on_message
+
+    def _start(self, queue: str, item):
+        self.executor.submit(self._process, queue, item)
+
+    def _process(self, queue: str, item):
+        consumer, method, properties, body = item
+        try:
+            worker = self.by_type.get(task_type_of(body)) or self.by_queue[queue]
+            worker._process(consumer.channel, method, properties, body, consumer.acks, consumer.route)
+        except Exception as e:
+            # _process settles every delivery itself; anything here is a bug, and the message is redelivered on reconnect
+            logger.error(f"Unhandled error processing a delivery from {queue}: {e!r}")
+        finally:
+            self.scheduler.done(queue)
+
+    def _consume(self, consumer: _Consumer, prefetch: int):
+        consumer.channel.basic_qos(prefetch_count=prefetch)
+        consumer.tag = consumer.channel.basic_consume(queue=consumer.route.queue, on_message_callback=self._on_message(consumer))
+        consumer.prefetch = prefetch
+        queue_prefetch.labels(queue=consumer.route.queue).set(prefetch)
+
+    def _rebalance(self):
+        """Move each queue's prefetch to its current share; re-subscribing keeps unacked deliveries where they are"""
+        active = self.scheduler.active()
+        for queue, worker in self.by_queue.items():
+            if any(worker.backlog.depth.values()):
+                active.add(queue)
+        for queue, prefetch in self.scheduler.prefetch(active).items():
+            consumer = self.consumers[queue]
+            if consumer.consuming and consumer.prefetch != prefetch:
+                consumer.channel.basic_cancel(consumer.tag)
+                self._consume(consumer, prefetch)
+            elif not consumer.consuming:
+                consumer.prefetch = prefetch
+
+    def _consume_all(self):
+        logger.info(f"Starting message consumption from {', '.join(self.by_queue)}...")
+        rebalanced = 0.0
+        while not drain.requested():
+            if time.monotonic() - rebalanced >= PREFETCH_REBALANCE_SECONDS:
+                self._rebalance()
+                rebalanced = time.monotonic()
+
+            for queue, consumer in self.consumers.items():
+                wait = open_retry_after(self.by_queue[queue].breakers)
+                if wait > 0:
+                    if consumer.consuming:
+                        logger.warning(f"⏸️ Consumption from {queue} paused for {wait:.0f}s while a circuit is open")
+                        consumer.channel.basic_cancel(consumer.tag)
+                    consumer_paused.labels(queue=queue).set(1)
+                elif not consumer.consuming:
+                    consumer_paused.labels(queue=queue).set(0)
+                    self._consume(consumer, consumer.prefetch)
+
+            # Dispatches deliveries and threadsafe callbacks for every channel on the connection
+            runner.connection.process_data_events(time_limit=1)
+
+    def _drain(self):
+        """Stop consuming every queue, requeue deliveries waiting for a slot, give running tasks until the deadline"""
+        consumers = [consumer for consumer in self.consumers.values() if not consumer.channel.is_closed]
+        held = sum(len(consumer.acks.outstanding - consumer.acks.succeeded) for consumer in consumers)
+        drain.begin(held)
+        for consumer in consumers:
+            if consumer.consuming:
+                consumer.channel.basic_cancel(consumer.tag)
+        for worker in self.workers:
+            if worker.admission:
+                worker.admission.close()
+
+        waiting = self.scheduler.take_waiting()
+        unstarted = 0
+        for consumer in consumers:
+            tags = [method.delivery_tag for _, (owner, method, _, _) in waiting if owner is consumer]
+            unstarted += drain.hand_back_unstarted(consumer.acks, tags)
+        handed_back = drain.settle_in_flight(runner.connection, [consumer.acks for consumer in consumers], held - unstarted)
+        runner.connection.close()
+        drain.finish(handed_back)
+
+    def _on_ready(self):
+        startup.mark_ready()
+        for worker in self.workers:
+            worker.backlog.start()
+            threading.Thread(target=worker._warm_clients, daemon=True).start()
+        threading.Thread(target=self.workers[0]._serve_metrics, daemon=True).start()
+
+    def run(self):
+        """Connect, declare every queue's topology and consume from all of them until stopped (blocking)"""
+        ready = False
+        drain.install()
+        while not drain.requested():
+            try:
+                runner._connect()
+                for worker in self.workers:
+                    runner._declare_topology(worker.route)
+                self.scheduler.drop(lambda item: item[0].channel.is_closed)
+
+                initial = self.scheduler.prefetch(set())
+                self.consumers = {}
+                for queue, worker in self.by_queue.items():
+                    ch = runner.connection.channel()
+                    # Dead-letter publishes wait for the broker's confirm before the original is acked
+                    ch.confirm_delivery()
+                    self.consumers[queue] = _Consumer(worker.route, ch, AckBatcher(ch))
+                    self.consumers[queue].prefetch = initial[queue]
+
+                if not ready:
+                    self._on_ready()
+                    ready = True
+
+                self._consume_all()
+                self._drain()
+                return
+            except KeyboardInterrupt:
+                logger.warning("Consumer stopped manually")
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                runner.connection.close()
+                return
+            except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError) as e:
+                # In-flight jobs keep running on the pool; their results are cached for the redelivered copies
+                logger.warning(f"🔌 RabbitMQ connection lost ({e!r}), reconnecting")
+                rabbitmq_reconnects_total.inc()
+                try:
+                    if runner.connection is not None and runner.connection.is_open:
+                        runner.connection.close()
+                except Exception:
+                    pass
+
+        # SIGTERM while the connection was down: the broker already requeued every delivery it had given us
+        drain.begin(0)
+        drain.finish(sum(worker.backlog.in_flight for worker in self.workers))
@@ -0,0 +1,228 @@
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import itertools
+import tempfile
+import threading
+import contextvars
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+from .logger import logger
+from .metrics import profiles_captured_total
+
+# Bearer token for the /debug/profile endpoints; they are disabled while unset
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+# Profile every Kth task with cProfile and keep the result on disk (0 = off)
+PROFILE_EVERY_N_TASKS = int(os.getenv("PROFILE_EVERY_N_TASKS", 0))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 20))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))
+MAX_PROFILE_SECONDS = 300
+
+_current = contextvars.ContextVar("task_profile", default=None)
+
+
+def sample_stacks(seconds: float, interval: float = PROFILE_SAMPLE_INTERVAL) -> str:
+    """
+    Sample every thread's Python stack for `seconds` and return them in
+    collapsed format ("thread;outer;...;inner count" per line), ready for
+    flamegraph.pl or speedscope.
+    """
+    own = threading.get_ident()
+    names = {t.ident: t.name for t in threading.enumerate()}
+    counts = Counter()
+    deadline = time.monotonic() + min(seconds, MAX_PROFILE_SECONDS)
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(thread_id) or str(thread_id))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    profiles_captured_total.labels(mode="sampled").inc()
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+def memory_diff(seconds: float, top: int = 30) -> str:
+    """tracemalloc snapshot diff over `seconds`, largest growth first"""
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(25)
+    try:
+        before = tracemalloc.take_snapshot()
+        time.sleep(min(seconds, MAX_PROFILE_SECONDS))
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+
+    noise = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = after.filter_traces(noise).compare_to(before.filter_traces(noise), "lineno")
+    profiles_captured_total.labels(mode="memory").inc()
+    lines = [f"Top {top} allocation changes over {seconds:.0f}s"]
+    lines += [str(stat) for stat in stats[:top]]
+    return "\n".join(lines) + "\n"
+
+
+class _TaskProfiles:
+    """cProfile results for the next N tasks, merged into one pstats.Stats"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.remaining = 0
+        self.requested = 0
+        self.finished = 0
+        self.stats = None
+        self.counter = itertools.count(1)
+
+    def arm(self, count: int):
+        with self.lock:
+            self.remaining = self.requested = count
+            self.finished = 0
+            self.stats = None
+
+    def claim(self) -> bool:
+        with self.lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+    def add(self, stats):
+        """One requested task is done; `stats` is None if it could not be profiled"""
+        with self.lock:
+            if self.stats is None:
+                self.stats = stats
+            elif stats is not None:
+                self.stats.add(stats)
+            self.finished += 1
+
+    def result(self):
+        """(tasks still to finish, merged Stats once all requested tasks are done)"""
+        with self.lock:
+            outstanding = self.requested - self.finished
+            return outstanding, self.stats if outstanding == 0 else None
+
+
+task_profiles = _TaskProfiles()
+
+
+class _TaskCapture:
+    """
+    cProfile is per thread: one profile for each thread that works on the
+    task, merged when the task ends. Threads still running by then (e.g.
+    the losing copy of a hedged request) are left out.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.profiles = []
+        self.open = True
+
+    def add(self, profile: cProfile.Profile):
+        with self.lock:
+            if self.open:
+                self.profiles.append(profile)
+
+    def close(self):
+        """Merged stats, or None if no thread could be profiled"""
+        with self.lock:
+            self.open = False
+            return pstats.Stats(*self.profiles) if self.profiles else None
+
+
+def current():
+    """Profile capture of the task running on this thread, or None if it is not being profiled"""
+    return _current.get()
+
+
+@contextmanager
+def activate(capture):
+    """
+    Profile this thread into `capture` (see current). For threads a task
+    hands work to, e.g. pipeline stages; no-op for None.
+    """
+    if capture is None:
+        yield
+        return
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Another profiler is already active on this interpreter
+        profile = None
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.disable()
+            capture.add(profile)
+
+
+@contextmanager
+def task_profile(task_id: str):
+    """Run one task under cProfile, on its own and any activated threads, if it was requested or it is the Kth task"""
+    requested = task_profiles.claim()
+    automatic = PROFILE_EVERY_N_TASKS > 0 and next(task_profiles.counter) % PROFILE_EVERY_N_TASKS == 0
+    if not (requested or automatic):
+        yield
+        return
+
+    capture = _TaskCapture()
+    token = _current.set(capture)
+    try:
+        with activate(capture):
+            yield
+    finally:
+        _current.reset(token)
+        stats = capture.close()
+        if requested:
+            task_profiles.add(stats)
+            profiles_captured_total.labels(mode="tasks").inc()
+        if automatic and stats is not None:
+            _save(stats, task_id)
+
+
+def _save(stats: pstats.Stats, task_id: str):
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{int(time.time())}-{task_id}.pstats")
+        stats.dump_stats(path)
+        profiles_captured_total.labels(mode="automatic").inc()
+        for old in saved_profiles()[PROFILE_KEEP:]:
+            os.remove(os.path.join(PROFILE_DIR, old))
+    except OSError as e:
+        logger.warning(f"⚠️ Could not save task profile: {e}")
+
+
+def saved_profiles() -> list:
+    """Automatic task profiles on disk, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return sorted((f for f in os.listdir(PROFILE_DIR) if f.endswith(".pstats")), reverse=True)
+
+
+def saved_profile_path(name: str):
+    return os.path.join(PROFILE_DIR, name) if name in saved_profiles() else None
+
+
+def render_stats(stats: pstats.Stats, fmt: str):
+    """(body, content type) for merged stats: binary pstats dump or a cumulative-time text table"""
+    if fmt == "pstats":
+        with tempfile.NamedTemporaryFile(suffix=".pstats") as f:
+            stats.dump_stats(f.name)
+            return f.read(), "application/octet-stream"
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats("cumulative").print_stats(60)
+    return stream.getvalue(), "text/plain"
@@ -0,0 +1,91 @@
+import os
+import threading
+
+from .logger import logger
+from .startup import timed
+from .schema import TaskStatus, encode, decode_status
+from .status_stream import StatusStreamWriter
+
+from dotenv import load_dotenv
+load_dotenv()
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = os.getenv("REDIS_PORT", 6379)
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", "")
+
+TASK_TTL_SECONDS = int(os.getenv("REDIS_TASK_TTL", 300))
+# Where status updates go: "pubsub" (default), "stream" (replayable, see status_stream) or "both"
+STATUS_SINK = os.getenv("STATUS_SINK", "pubsub")
+
+_rdb = None
+_rdb_lock = threading.Lock()
+
+def get_redis():
+    """Redis client, created on first use so startup does not pay for it"""
+    global _rdb
+    if _rdb is None:
+        with _rdb_lock:
+            if _rdb is None:
+                with timed("redis_client"):
+                    import redis
+                    _rdb = redis.Redis(
+                        host=REDIS_HOST,
+                        port=REDIS_PORT,
+                        password=REDIS_PASSWORD,
+                        socket_connect_timeout=15,
+                        socket_timeout=5,
+                        max_connections=5
+                    )
+    return _rdb
+
+_status_stream = StatusStreamWriter(get_redis)
+
+def publish_status(task_id, status, progress, message, fileUrl=None):
+    publish_result(task_id, TaskStatus(status=status, progress=progress, message=message, file_url=fileUrl))
+
+def publish_result(task_id: str, result: TaskStatus):
+    """
+    Save task result in Redis and publish update
+    Key: task:<taskId>:status (HASH)
+    Pub/Sub: task:<taskId>:status
+    Stream: task:<taskId>:events or task-status:<shard> (when STATUS_SINK includes it)
+    """
+    key = f"task:{task_id}:status"
+    payload = encode(result)
+
+    with logger.contextualize(taskId=task_id):
+
+        try:
+            if STATUS_SINK in ("stream", "both"):
+                _status_stream.append(task_id, result)
+            if STATUS_SINK in ("pubsub", "both"):
+                get_redis().publish(key, payload)
+
+            logger.bind(event="status").info(f"Redis result published for task {task_id}")
+        except Exception as e:
+            logger.error(f"Redis publish failed: {e}")
+
+def cache_task_output(task_type: str, task_id: str, result: TaskStatus):
+    with logger.contextualize(taskId=task_id):
+        key = f"task:{task_type}:{task_id}:output"
+        get_redis().setex(key, TASK_TTL_SECONDS, encode(result))
+        logger.bind(event="cache").info(f"Cached output for {key}")
+
+def get_cached_output(task_type: str, task_id: str):
+    with logger.contextualize(taskId=task_id):
+        key = f"task:{task_type}:{task_id}:output"
+        result = get_redis().get(key)
+        if result:
+            logger.bind(event="cache").info(f"Found cached output for {key}")
+            return decode_status(result)
+        return None
+    
+
+def isRedisHealthy():
+    try:
+        result = get_redis().ping()
+        return result == True or result == b"PONG" or result == "PONG"
+    except Exception as e:
+        logger.error(f"Redis health check failed: {e}")
+        return False
\ No newline at end of file
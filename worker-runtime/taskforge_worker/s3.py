@@ -0,0 +1,132 @@
+import os
+import threading
+from .logger import logger, service_name
+from .metrics import s3_upload_failures_total
+from .startup import timed
+from . import usage
+from .s3_key_index import S3KeyIndex, SharedWrites
+
+AWS_REGION = os.getenv("AWS_REGION")
+S3_BUCKET = os.getenv("S3_BUCKET_NAME")
+S3_EXPIRE_SECONDS = int(os.getenv("S3_SIGNED_URL_EXP", 600))  # 10 min default
+
+_s3 = None
+_s3_lock = threading.Lock()
+
+def get_s3():
+    """
+    S3 client, created on first use.
+    Importing boto3 and building the client is the most expensive part of
+    startup, so it stays off the path to the first consumed message.
+    """
+    global _s3
+    if _s3 is None:
+        with _s3_lock:
+            if _s3 is None:
+                with timed("s3_client"):
+                    import boto3
+                    _s3 = boto3.client(
+                        "s3",
+                        region_name=AWS_REGION,
+                        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+                    )
+    return _s3
+
+def upload_file(file_path: str, s3_key: str, content_type: str) -> str:
+    """
+    Uploads a file to S3 and returns a signed URL
+    """
+    s3 = get_s3()
+    from botocore.exceptions import BotoCoreError, ClientError
+    try:
+        logger.info(f"Uploading to S3 → {S3_BUCKET}/{s3_key}")
+        s3.upload_file(
+            Filename=file_path,
+            Bucket=S3_BUCKET,
+            Key=s3_key,
+            ExtraArgs={"ContentType": content_type}
+        )
+        usage.add_uploaded(os.path.getsize(file_path))
+
+        signed_url = generate_signed_url(s3_key)
+
+        record_key(s3_key)
+        logger.info(f"🔑 Signed S3 URL generated (expires in {S3_EXPIRE_SECONDS}s)")
+        return signed_url
+
+    except (BotoCoreError, ClientError) as e:
+        s3_upload_failures_total.labels(type=service_name()).inc()
+        logger.error(f"S3 upload failed: {e}")
+        raise RuntimeError("Upload to S3 failed") from e
+
+def upload_bytes(data: bytes, s3_key: str, content_type: str):
+    """Put a small object built in memory, e.g. a playlist; no URL is signed and nothing is recorded"""
+    get_s3().put_object(Bucket=S3_BUCKET, Key=s3_key, Body=data, ContentType=content_type)
+    usage.add_uploaded(len(data))
+
+def read_bytes(s3_key: str) -> bytes:
+    data = get_s3().get_object(Bucket=S3_BUCKET, Key=s3_key)["Body"].read()
+    usage.add_downloaded(len(data))
+    return data
+
+def _list_keys(prefix: str):
+    paginator = get_s3().get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            yield obj["Key"]
+
+def _redis():
+    from .redis_client import get_redis
+    return get_redis()
+
+# One index per output prefix a service writes to, see Worker(output_prefix=...)
+key_indexes = {}
+_shared_writes = SharedWrites(_redis)
+
+def register_key_index(prefix: str) -> S3KeyIndex:
+    if prefix not in key_indexes:
+        key_indexes[prefix] = S3KeyIndex(prefix, _list_keys, _shared_writes)
+    return key_indexes[prefix]
+
+def _index_for(bucket: str, key: str):
+    if bucket != S3_BUCKET:
+        return None
+    return next((index for prefix, index in key_indexes.items() if key.startswith(prefix)), None)
+
+def record_key(s3_key: str):
+    """Tell the key index about an object we know exists, e.g. one written by another service"""
+    index = _index_for(S3_BUCKET, s3_key)
+    if index is not None:
+        index.add(s3_key)
+
+def file_exists(bucket: str, key: str) -> bool:
+    # Output keys are answered locally when possible; only possible-positives cost a HEAD
+    index = _index_for(bucket, key)
+    if index is not None:
+        index.start()
+        known = index.lookup(key)
+        if known is not None:
+            return known
+
+    s3 = get_s3()
+    from botocore.exceptions import ClientError
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+        if index is not None:
+            index.record_head(key, True)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == "404":
+            if index is not None:
+                index.record_head(key, False)
+            return False
+        logger.error(f"S3 head_object failed: {e}")
+        return False
+
+def generate_signed_url(s3_key: str, expires: int = None) -> str:
+    return get_s3().generate_presigned_url(
+        ClientMethod='get_object',
+        Params={"Bucket": S3_BUCKET, "Key": s3_key},
+        ExpiresIn=expires or S3_EXPIRE_SECONDS
+    )
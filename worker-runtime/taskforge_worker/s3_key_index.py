@@ -0,0 +1,181 @@
+import os
+import math
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .logger import logger
+from .metrics import s3_key_index_lookups_total, s3_key_index_false_positives_total, s3_key_index_keys
+
+S3_KEY_INDEX_ENABLED = os.getenv("S3_KEY_INDEX_ENABLED", "true").lower() == "true"
+S3_KEY_INDEX_CAPACITY = int(os.getenv("S3_KEY_INDEX_CAPACITY", 1_000_000))
+S3_KEY_INDEX_ERROR_RATE = float(os.getenv("S3_KEY_INDEX_ERROR_RATE", 0.01))
+S3_KEY_INDEX_REFRESH_SECONDS = int(os.getenv("S3_KEY_INDEX_REFRESH", 1800))
+S3_KEY_INDEX_LRU_SIZE = int(os.getenv("S3_KEY_INDEX_LRU_SIZE", 10000))
+S3_KEY_INDEX_LRU_TTL_SECONDS = int(os.getenv("S3_KEY_INDEX_LRU_TTL", 3600))
+# How long keys written by any pod stay shared through Redis; also how old a listing may get before it is not trusted
+S3_KEY_INDEX_SHARED_TTL_SECONDS = int(os.getenv("S3_KEY_INDEX_SHARED_TTL", 2 * S3_KEY_INDEX_REFRESH_SECONDS))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over one blake2b digest"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class SharedWrites:
+    """
+    Output keys written by any pod in the last S3_KEY_INDEX_SHARED_TTL
+    seconds, kept in Redis. A pod's Bloom filter only knows its own last
+    listing and its own uploads; this covers what other pods wrote since.
+    """
+
+    def __init__(self, get_redis):
+        self._get_redis = get_redis
+
+    def add(self, key: str):
+        try:
+            self._get_redis().set(f"s3-written:{key}", 1, ex=S3_KEY_INDEX_SHARED_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not share written key {key}: {e}")
+
+    def contains(self, key: str):
+        """True or False, or None if Redis could not be asked"""
+        try:
+            return bool(self._get_redis().exists(f"s3-written:{key}"))
+        except Exception:
+            return None
+
+
+class S3KeyIndex:
+    """
+    Local answer to "does this output key exist?" for one S3 prefix.
+
+    A Bloom filter rebuilt from periodic prefix listings, and a small LRU of
+    recently confirmed keys that answers repeat hits. A Bloom miss only
+    rules a key out together with `shared` (SharedWrites): the listing says
+    it did not exist when the listing began, and no pod has written it
+    since. Bloom possible-positives, keys shared as written but not yet
+    listed, and every lookup while no listing is recent enough to trust
+    (before the first one, or after refreshes kept failing) need a HEAD.
+    """
+
+    def __init__(self, prefix: str, list_keys, shared: SharedWrites = None):
+        self.prefix = prefix
+        self._list_keys = list_keys
+        self._shared = shared
+        self._bloom = None
+        # When the listing behind _bloom began; keys written after that may be missing from it
+        self._listed_at = 0.0
+        self._pending = []
+        self._rebuilding = False
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None and S3_KEY_INDEX_ENABLED:
+            self._thread = threading.Thread(target=self._refresh_loop, name="s3-key-index", daemon=True)
+            self._thread.start()
+
+    def lookup(self, key: str):
+        """True if recently confirmed, False if certainly absent, None if a HEAD is needed"""
+        with self._lock:
+            seen_at = self._recent.get(key)
+            if seen_at is not None and time.monotonic() - seen_at < S3_KEY_INDEX_LRU_TTL_SECONDS:
+                self._recent.move_to_end(key)
+                s3_key_index_lookups_total.labels(prefix=self.prefix, result="recent").inc()
+                return True
+            bloom = self._bloom
+            listed_at = self._listed_at
+
+        if bloom is None or time.time() - listed_at > S3_KEY_INDEX_SHARED_TTL_SECONDS:
+            s3_key_index_lookups_total.labels(prefix=self.prefix, result="not_ready").inc()
+            return None
+        if key not in bloom:
+            written = self._shared.contains(key) if self._shared is not None else False
+            if written is False:
+                s3_key_index_lookups_total.labels(prefix=self.prefix, result="absent").inc()
+                return False
+            # Written by another pod since our listing, or Redis could not say
+            s3_key_index_lookups_total.labels(prefix=self.prefix, result="shared").inc()
+            return None
+        s3_key_index_lookups_total.labels(prefix=self.prefix, result="maybe").inc()
+        return None
+
+    def record_head(self, key: str, exists: bool):
+        """Feed a HEAD result back; a miss on a Bloom positive is a false positive"""
+        if exists:
+            self._remember(key)
+        elif self._bloom is not None and key in self._bloom:
+            s3_key_index_false_positives_total.labels(prefix=self.prefix).inc()
+
+    def add(self, key: str):
+        """Record a key we know exists, e.g. right after uploading it, and share it with the other pods"""
+        self._remember(key)
+        if self._shared is not None:
+            self._shared.add(key)
+
+    def _remember(self, key: str):
+        with self._lock:
+            self._recent[key] = time.monotonic()
+            self._recent.move_to_end(key)
+            while len(self._recent) > S3_KEY_INDEX_LRU_SIZE:
+                self._recent.popitem(last=False)
+            if self._bloom is not None:
+                self._bloom.add(key)
+            if self._rebuilding:
+                self._pending.append(key)
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                self._rebuild()
+            except Exception as e:
+                logger.error(f"S3 key index refresh for {self.prefix} failed: {e}")
+            time.sleep(S3_KEY_INDEX_REFRESH_SECONDS)
+
+    def _rebuild(self):
+        started = time.time()
+        with self._lock:
+            self._rebuilding = True
+            self._pending = []
+
+        bloom = BloomFilter(S3_KEY_INDEX_CAPACITY, S3_KEY_INDEX_ERROR_RATE)
+        try:
+            for key in self._list_keys(self.prefix):
+                bloom.add(key)
+        finally:
+            with self._lock:
+                # Keys uploaded while we were listing may be missing from the listing
+                for key in self._pending:
+                    bloom.add(key)
+                self._rebuilding = False
+                self._pending = []
+        with self._lock:
+            self._bloom = bloom
+            self._listed_at = started
+
+        s3_key_index_keys.labels(prefix=self.prefix).set(bloom.count)
+        if bloom.count > S3_KEY_INDEX_CAPACITY:
+            logger.warning(f"S3 key index for {self.prefix} holds {bloom.count} keys, above its capacity of {S3_KEY_INDEX_CAPACITY}; false positives will rise")
+        logger.info(f"S3 key index for {self.prefix} rebuilt with {bloom.count} keys in {time.time() - started:.1f}s")
@@ -0,0 +1,55 @@
+from typing import Any, Optional
+
+import msgspec
+
+
+class TaskValidationError(ValueError):
+    """The message can never be processed; it goes straight to the DLQ"""
+
+
+class TaskStatus(msgspec.Struct, rename="camel", omit_defaults=True):
+    """
+    Status update published on task:<taskId>:status and stored as the cached output.
+    Unset fields are left out of the JSON entirely.
+    """
+    status: Optional[str] = None
+    progress: Optional[int] = None
+    message: Optional[str] = None
+    success: Optional[bool] = None
+    url: Optional[str] = None
+    file_url: Optional[str] = None
+    error: Optional[str] = None
+    cached: Optional[bool] = None
+
+
+class Job(msgspec.Struct):
+    """What a handler receives: the decoded task plus delivery context"""
+    task: Any
+    retry_count: int = 0
+    footprint: Any = None
+
+
+_status_decoder = msgspec.json.Decoder(TaskStatus)
+_encoder = msgspec.json.Encoder()
+
+
+def task_decoder(task_type: type):
+    """bytes -> task_type, raising TaskValidationError for anything that does not fit the schema"""
+    decoder = msgspec.json.Decoder(task_type)
+
+    def decode_task(body: bytes):
+        try:
+            return decoder.decode(body)
+        except msgspec.DecodeError as e:
+            # ValidationError (bad shape or __post_init__ check) is a DecodeError too
+            raise TaskValidationError(str(e)) from e
+
+    return decode_task
+
+
+def decode_status(data: bytes) -> TaskStatus:
+    return _status_decoder.decode(data)
+
+
+def encode(obj) -> bytes:
+    return _encoder.encode(obj)
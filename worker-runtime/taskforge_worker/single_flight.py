@@ -0,0 +1,152 @@
+import os
+import time
+import socket
+import threading
+import uuid
+
+from .redis_client import get_redis
+from .logger import logger
+from .metrics import single_flight_total
+from .schema import TaskStatus, encode, decode_status
+
+LEASE_TTL_SECONDS = int(os.getenv("SINGLE_FLIGHT_LEASE_TTL", 30))
+WAIT_TIMEOUT_SECONDS = int(os.getenv("SINGLE_FLIGHT_WAIT_TIMEOUT", 1800))
+
+# Only the current owner may extend or drop a lease
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+_scripts = {}
+# Leases this process holds, so a draining worker can give them up (see abandon_leases)
+_held = set()
+_held_lock = threading.Lock()
+
+def _script(source: str):
+    if source not in _scripts:
+        _scripts[source] = get_redis().register_script(source)
+    return _scripts[source]
+
+
+class Lease:
+    """
+    Renewable Redis lease on an output key.
+    Key: lease:<outputKey> (STRING, value = owner id, PX = lease TTL)
+    Pub/Sub: lease:<outputKey>:done (holder's final result)
+    """
+
+    def __init__(self, output_key: str):
+        self.key = f"lease:{output_key}"
+        self.channel = f"lease:{output_key}:done"
+        self.owner = f"{socket.gethostname()}:{uuid.uuid4().hex}"
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def acquire(self) -> bool:
+        if not get_redis().set(self.key, self.owner, nx=True, px=LEASE_TTL_SECONDS * 1000):
+            return False
+        self._thread = threading.Thread(target=self._renew_loop, daemon=True)
+        self._thread.start()
+        with _held_lock:
+            _held.add(self)
+        return True
+
+    def _renew_loop(self):
+        while not self._stop.wait(LEASE_TTL_SECONDS / 3):
+            try:
+                if not _script(RENEW_SCRIPT)(keys=[self.key], args=[self.owner, LEASE_TTL_SECONDS * 1000]):
+                    self.lost = True
+                    logger.warning(f"Lease {self.key} lost before the task finished")
+                    return
+            except Exception as e:
+                # Keep trying; the lease only lapses after a full TTL without renewal
+                logger.error(f"Lease renewal failed for {self.key}: {e}")
+
+    def release(self, result: TaskStatus):
+        self._stop.set()
+        with _held_lock:
+            _held.discard(self)
+        try:
+            get_redis().publish(self.channel, encode(result))
+            _script(RELEASE_SCRIPT)(keys=[self.key], args=[self.owner])
+        except Exception as e:
+            logger.error(f"Lease release failed for {self.key}: {e}")
+
+
+def abandon_leases():
+    """
+    Drop every lease this process holds without a result, so workers
+    waiting on them take the work over now rather than after a full
+    LEASE_TTL_SECONDS. For a worker handing its in-flight tasks back.
+    """
+    with _held_lock:
+        leases = list(_held)
+    for lease in leases:
+        lease.release(TaskStatus(success=False))
+    return len(leases)
+
+
+def single_flight(output_key: str, work, lookup):
+    """
+    Run `work()` on exactly one worker per output key.
+
+    Returns (result, shared). When another worker already holds the lease we
+    wait for its completion and return its result with shared=True. If the
+    holder fails or its lease expires (crashed pod), we take the lease over.
+    `lookup()` returns an already-completed result, closing the gap between a
+    holder finishing and us subscribing.
+    """
+    deadline = time.time() + WAIT_TIMEOUT_SECONDS
+
+    while True:
+        lease = Lease(output_key)
+        if lease.acquire():
+            single_flight_total.labels(outcome="leader").inc()
+            result = TaskStatus(success=False)
+            try:
+                result = work()
+                return result, False
+            finally:
+                lease.release(result)
+
+        result = _wait_for_holder(lease, deadline, lookup)
+        if result is not None:
+            single_flight_total.labels(outcome="shared").inc()
+            return result, True
+
+        if time.time() >= deadline:
+            single_flight_total.labels(outcome="timeout").inc()
+            raise TimeoutError(f"Gave up waiting on in-flight work for {output_key}")
+
+        logger.info(f"Holder of {lease.key} gone without a result, taking over")
+
+
+def _wait_for_holder(lease: Lease, deadline: float, lookup):
+    pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+    try:
+        pubsub.subscribe(lease.channel)
+
+        cached = lookup()
+        if cached:
+            return cached
+
+        logger.info(f"⏳ Waiting on in-flight work holding {lease.key}")
+        while time.time() < deadline:
+            message = pubsub.get_message(timeout=1.0)
+            if message:
+                result = decode_status(message["data"])
+                return result if result.success else None
+            if not get_redis().exists(lease.key):
+                return lookup()
+        return None
+    finally:
+        pubsub.close()
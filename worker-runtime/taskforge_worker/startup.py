@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from importlib.abc import MetaPathFinder
+
+# Deliberately no logger/metrics imports here: this module is loaded before
+# anything else so the import profiler can see the whole graph.
+
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "false").lower() == "true"
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", 5))
+
+# Dotted imports under these prefixes are reported alongside top-level modules
+_first_party = ["taskforge_worker."]
+
+_module_loaded_at = time.time()
+_import_times = {}
+_init_times = {}
+_first_message_seen = False
+_lock = threading.Lock()
+
+
+def _logger():
+    from .logger import logger
+    return logger
+
+
+def process_start_time() -> float:
+    """Wall-clock time the process was started (includes interpreter boot), from /proc when available"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return _module_loaded_at
+
+
+class _TimingLoader:
+    def __init__(self, loader, name):
+        self._loader = loader
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            # Cumulative: includes anything this module imported while executing
+            _import_times[self._name] = time.perf_counter() - start
+
+
+class _TimingFinder(MetaPathFinder):
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimingLoader(spec.loader, fullname)
+                return spec
+        return None
+
+
+def enable_import_profiling(first_party=()):
+    """Time every module imported from here on; only active with STARTUP_PROFILE=true"""
+    _first_party.extend(first_party)
+    if STARTUP_PROFILE and not any(isinstance(f, _TimingFinder) for f in sys.meta_path):
+        sys.meta_path.insert(0, _TimingFinder())
+
+
+@contextmanager
+def timed(name: str):
+    """Record how long an initialization step took"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _init_times[name] = time.perf_counter() - start
+
+
+def mark_ready():
+    """Call once the consumer is subscribed; checks the startup budget"""
+    from .metrics import worker_startup_seconds
+    logger = _logger()
+    elapsed = time.time() - process_start_time()
+    worker_startup_seconds.set(elapsed)
+    if elapsed > STARTUP_BUDGET_SECONDS:
+        logger.warning(f"Startup took {elapsed:.2f}s, over the {STARTUP_BUDGET_SECONDS:.0f}s budget")
+    else:
+        logger.info(f"Consumer ready {elapsed:.2f}s after process start")
+    if STARTUP_PROFILE:
+        report()
+
+
+def mark_first_message():
+    global _first_message_seen
+    if _first_message_seen:
+        return
+    with _lock:
+        if _first_message_seen:
+            return
+        _first_message_seen = True
+    from .metrics import worker_time_to_first_message_seconds
+    elapsed = time.time() - process_start_time()
+    worker_time_to_first_message_seconds.set(elapsed)
+    _logger().info(f"First message received {elapsed:.2f}s after process start")
+
+
+def report(top: int = 15):
+    """Log the slowest top-level and first-party imports and every timed init step"""
+    tracked = {name: t for name, t in _import_times.items()
+               if "." not in name or name.startswith(tuple(_first_party))}
+    slowest = sorted(tracked.items(), key=lambda item: item[1], reverse=True)[:top]
+    _logger().info(
+        "Startup profile",
+        imports={name: round(t * 1000, 1) for name, t in slowest},
+        init={name: round(t * 1000, 1) for name, t in _init_times.items()},
+    )
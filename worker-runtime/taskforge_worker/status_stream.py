@@ -0,0 +1,107 @@
+import os
+import time
+import zlib
+import queue
+import atexit
+import threading
+
+from .logger import logger
+from .metrics import status_stream_appends_total, status_stream_batch_size
+from .schema import TaskStatus, encode, decode_status
+
+# 0 = one stream per task (task:<id>:events); N = task-status:<0..N-1> shared by all tasks
+STATUS_STREAM_SHARDS = int(os.getenv("STATUS_STREAM_SHARDS", 0))
+STATUS_STREAM_MAXLEN = int(os.getenv("STATUS_STREAM_MAXLEN", 1000))
+STATUS_STREAM_TTL_SECONDS = int(os.getenv("STATUS_STREAM_TTL", 3600))
+STATUS_STREAM_BATCH_SIZE = int(os.getenv("STATUS_STREAM_BATCH_SIZE", 100))
+STATUS_STREAM_FLUSH_MS = int(os.getenv("STATUS_STREAM_FLUSH_MS", 20))
+
+
+def stream_key(task_id: str) -> str:
+    if STATUS_STREAM_SHARDS > 0:
+        return f"task-status:{zlib.crc32(task_id.encode()) % STATUS_STREAM_SHARDS}"
+    return f"task:{task_id}:events"
+
+
+class StatusStreamWriter:
+    """
+    Appends status updates to Redis Streams from a background thread.
+    Updates queued within STATUS_STREAM_FLUSH_MS go out as one pipelined batch
+    of XADD MAXLEN ~ calls; per-task ordering is preserved because a single
+    thread drains the queue in order.
+    """
+
+    def __init__(self, get_redis):
+        self._get_redis = get_redis
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def append(self, task_id: str, result: TaskStatus):
+        self._ensure_started()
+        self._queue.put((task_id, encode(result)))
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._drain, name="status-stream", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _drain(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + STATUS_STREAM_FLUSH_MS / 1000
+            while len(batch) < STATUS_STREAM_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, batch):
+        try:
+            pipe = self._get_redis().pipeline(transaction=False)
+            for task_id, data in batch:
+                key = stream_key(task_id)
+                pipe.xadd(key, {"taskId": task_id, "data": data}, maxlen=STATUS_STREAM_MAXLEN, approximate=True)
+                if STATUS_STREAM_SHARDS == 0:
+                    pipe.expire(key, STATUS_STREAM_TTL_SECONDS)
+            pipe.execute()
+            status_stream_appends_total.inc(len(batch))
+            status_stream_batch_size.observe(len(batch))
+        except Exception as e:
+            logger.error(f"Status stream append failed for {len(batch)} updates: {e}")
+
+    def flush(self, timeout: float = 2.0):
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+def read_status_updates(rdb, task_id: str, last_id: str = "0-0", block_ms: int = 0, count: int = 100):
+    """
+    Status updates for a task recorded after `last_id`.
+    Returns ([(entry_id, TaskStatus)], cursor); pass `cursor` back in as
+    `last_id` to resume where the reader left off, e.g. after a reconnect.
+    With sharded streams other tasks' entries are skipped but still advance the cursor.
+    """
+    key = stream_key(task_id)
+    response = rdb.xread({key: last_id}, count=count, block=block_ms or None)
+    updates = []
+    cursor = last_id
+    for _, entries in response or []:
+        for entry_id, fields in entries:
+            cursor = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+            owner = fields.get(b"taskId", fields.get("taskId"))
+            if isinstance(owner, bytes):
+                owner = owner.decode()
+            if owner == task_id:
+                updates.append((cursor, decode_status(fields.get(b"data", fields.get("data")))))
+    return updates, cursor
@@ -0,0 +1,159 @@
+import os
+import time
+import threading
+import contextvars
+import tracemalloc
+from contextlib import contextmanager
+
+from .metrics import task_child_cpu_seconds, task_child_max_rss_bytes, task_child_io_bytes, task_transfer_bytes, task_python_cpu_seconds, task_python_alloc_peak_bytes
+
+# Trace Python allocations (tracemalloc, one frame deep) to report each task's allocation peak; costs some CPU on every allocation
+USAGE_TRACE_ALLOCATIONS = os.getenv("USAGE_TRACE_ALLOCATIONS", "false").lower() == "true"
+
+# getrusage reports block I/O in 512-byte units
+_BLOCK_BYTES = 512
+
+_current = contextvars.ContextVar("task_usage", default=None)
+
+
+class TaskUsage:
+    """
+    Resources one task consumed, added to from whichever thread does the
+    work: child processes reaped with wait_child, bytes moved in and out,
+    and CPU of the Python threads the task ran on (see activate).
+    """
+
+    def __init__(self):
+        self.child_cpu_seconds = 0.0
+        self.child_max_rss_bytes = 0
+        self.child_read_bytes = 0
+        self.child_write_bytes = 0
+        self.children = 0
+        self.downloaded_bytes = 0
+        self.uploaded_bytes = 0
+        self.python_cpu_seconds = 0.0
+        self.python_alloc_peak_bytes = None
+        self._lock = threading.Lock()
+
+    def add_child(self, rusage):
+        with self._lock:
+            self.children += 1
+            self.child_cpu_seconds += rusage.ru_utime + rusage.ru_stime
+            # ru_maxrss is in KiB on Linux; children of one task rarely overlap, so the largest is the peak
+            self.child_max_rss_bytes = max(self.child_max_rss_bytes, rusage.ru_maxrss * 1024)
+            self.child_read_bytes += rusage.ru_inblock * _BLOCK_BYTES
+            self.child_write_bytes += rusage.ru_oublock * _BLOCK_BYTES
+
+    def add_downloaded(self, n: int):
+        with self._lock:
+            self.downloaded_bytes += n
+
+    def add_uploaded(self, n: int):
+        with self._lock:
+            self.uploaded_bytes += n
+
+    def add_python_cpu(self, seconds: float):
+        with self._lock:
+            self.python_cpu_seconds += seconds
+
+    def summary(self) -> dict:
+        """For the completion log"""
+        summary = {
+            "childCpuSeconds": round(self.child_cpu_seconds, 3),
+            "childMaxRssBytes": self.child_max_rss_bytes,
+            "childReadBytes": self.child_read_bytes,
+            "childWriteBytes": self.child_write_bytes,
+            "children": self.children,
+            "downloadedBytes": self.downloaded_bytes,
+            "uploadedBytes": self.uploaded_bytes,
+            "pythonCpuSeconds": round(self.python_cpu_seconds, 3),
+        }
+        if self.python_alloc_peak_bytes is not None:
+            summary["pythonAllocPeakBytes"] = self.python_alloc_peak_bytes
+        return summary
+
+    def observe(self, task_type: str, output_fmt: str):
+        labels = {"type": task_type, "format": output_fmt}
+        task_python_cpu_seconds.labels(**labels).observe(self.python_cpu_seconds)
+        task_transfer_bytes.labels(direction="download", **labels).observe(self.downloaded_bytes)
+        task_transfer_bytes.labels(direction="upload", **labels).observe(self.uploaded_bytes)
+        if self.children:
+            task_child_cpu_seconds.labels(**labels).observe(self.child_cpu_seconds)
+            task_child_max_rss_bytes.labels(**labels).observe(self.child_max_rss_bytes)
+            task_child_io_bytes.labels(direction="read", **labels).observe(self.child_read_bytes)
+            task_child_io_bytes.labels(direction="write", **labels).observe(self.child_write_bytes)
+        if self.python_alloc_peak_bytes is not None:
+            task_python_alloc_peak_bytes.labels(**labels).observe(self.python_alloc_peak_bytes)
+
+
+def current():
+    """Usage of the task running on this thread, or None outside a task"""
+    return _current.get()
+
+
+@contextmanager
+def activate(usage):
+    """
+    Charge work done on this thread to `usage`, including its CPU time.
+    For threads a task hands work to, e.g. pipeline stages; no-op for None.
+    """
+    if usage is None:
+        yield
+        return
+    token = _current.set(usage)
+    started = time.thread_time()
+    try:
+        yield
+    finally:
+        usage.add_python_cpu(time.thread_time() - started)
+        _current.reset(token)
+
+
+@contextmanager
+def track(task_type: str, output_fmt: str):
+    """Account one task run on this thread; histograms are observed whether it succeeds or not"""
+    usage = TaskUsage()
+    baseline = _start_tracing()
+    try:
+        with activate(usage):
+            yield usage
+    finally:
+        if baseline is not None:
+            # Process-wide: with several tasks in flight this is the peak of all of them since the last reset
+            usage.python_alloc_peak_bytes = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+        usage.observe(task_type, output_fmt or "none")
+
+
+def _start_tracing():
+    if not USAGE_TRACE_ALLOCATIONS:
+        return None
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(1)
+    tracemalloc.reset_peak()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def wait_child(process) -> int:
+    """
+    Wait for a subprocess.Popen child and charge its CPU, peak RSS and
+    block I/O to the current task. Reaping it with wait4 is the only way
+    to get one child's own rusage; returns its exit code.
+    """
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    usage = current()
+    if usage is not None:
+        usage.add_child(rusage)
+    return process.returncode
+
+
+def add_downloaded(n: int):
+    usage = current()
+    if usage is not None:
+        usage.add_downloaded(n)
+
+
+def add_uploaded(n: int):
+    usage = current()
+    if usage is not None:
+        usage.add_uploaded(n)